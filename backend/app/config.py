@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Any, Dict, List
 import os
 
 class Settings(BaseSettings):
@@ -11,20 +11,98 @@ class Settings(BaseSettings):
     llm_model: str = "gpt-4-turbo-preview"
     llm_temperature: float = 0.0
     
+    # LLM Routing
+    # Ordered OpenAI-compatible endpoints as JSON, e.g.
+    # [{"name": "primary", "model": "gpt-4-turbo-preview"},
+    #  {"name": "local", "model": "llama3", "base_url": "http://localhost:11434/v1"}]
+    # Empty means a single endpoint using llm_model and openai_api_key.
+    llm_endpoints: List[Dict[str, Any]] = []
+    llm_request_timeout_seconds: float = 60.0  # Deadline for one routed call
+    llm_hedge_enabled: bool = True
+    llm_hedge_percentile: float = 95.0  # Hedge once time-to-first-token passes this percentile
+    llm_hedge_default_delay_seconds: float = 2.0  # Used until enough latency samples exist
+    llm_circuit_failure_threshold: int = 5  # Consecutive failures that open an endpoint's breaker
+    llm_circuit_reset_seconds: float = 30.0
+    llm_stall_timeout_seconds: float = 20.0  # Abort a stream that sends nothing for this long (HTTP read timeout)
+    llm_attempt_threads: int = 0  # Threads for LLM attempts; 0 sizes the pool from chat_concurrency
+    
     # RAG Configuration
     chunk_size: int = 1000
     chunk_overlap: int = 200
     top_k_results: int = 4
+    chat_coalescing_enabled: bool = True  # Share one run among identical in-flight queries
+    chat_coalesce_timeout_seconds: float = 120.0
+    relevance_threshold: float = 0.2  # Refuse without calling the LLM if no chunk scores this high (0 disables)
+    relevance_tail_margin: float = 0.15  # Drop chunks scoring more than this below the best one (0 disables)
+    hierarchical_retrieval: bool = False  # Pick the closest documents first, then search only their chunks
+    hierarchical_top_documents: int = 20  # Documents whose chunks are searched
+    hierarchical_min_chunks: int = 20000  # Flat search below this many chunks
+    mmr_lambda: float = 1.0  # Relevance vs. diversity when picking chunks (1, the default, disables MMR)
+    mmr_fetch_k: int = 20  # Candidates fetched for MMR to choose top_k_results from
+    mmr_max_fetch_k: int = 500  # Upper bound for per-request fetch sizes
+    
+    # Admission Control (separate pools; ingestion yields to queued chat requests)
+    chat_concurrency: int = 16  # Chat pipelines running at once
+    chat_queue_slo_seconds: float = 5.0  # Reject with 429 when the estimated queue wait exceeds this (0 disables)
+    ingest_concurrency: int = 2  # Uploads parsed and embedded at once
+    ingest_queue_slo_seconds: float = 60.0
+    rate_limit_chat_per_minute: int = 0  # Per client (tenant and address); 0 (default) disables
+    rate_limit_upload_per_minute: int = 0
+    rate_limit_burst: int = 10
+    rate_limit_trusted_proxies: List[str] = []  # Proxy IPs/CIDRs whose X-Forwarded-For names the client
     
     # Server Configuration
     backend_host: str = "0.0.0.0"
     backend_port: int = 8000
+    backend_workers: int = 1  # >1 requires vector_store_mode = "client"
     cors_origins: List[str] = ["http://localhost:5173", "http://localhost:3000"]
     
     # Database Paths
     vector_db_path: str = "./chroma_db"
     upload_dir: str = "./uploads"
     
+    # Admin Access (X-Admin-Token header); admin endpoints are disabled while empty
+    admin_token: str = ""
+    
+    # Sampled Profiling of chat and upload requests (collapsed stacks for flame graphs)
+    profile_sample_rate: float = 0.0  # Fraction of requests profiled; admins can ask with X-Profile: 1
+    profile_interval_ms: float = 5.0  # Stack sampling interval
+    profile_dir: str = "./profiles"
+    profile_retention: int = 100  # Profiles kept on disk, oldest deleted first
+    
+    # Deletion and Garbage Collection
+    delete_batch_size: int = 1000  # Chunk IDs fetched and deleted per round trip
+    gc_interval_seconds: int = 3600  # Background orphan cleanup interval (0 disables)
+    gc_grace_seconds: int = 60  # Leave unmarked files newer than this alone (uploads starting mid-pass)
+    
+    # ChromaDB HNSW Index (applied when the collection is created)
+    hnsw_space: str = "cosine"  # l2, cosine or ip
+    hnsw_construction_ef: int = 200
+    hnsw_search_ef: int = 64
+    hnsw_m: int = 16
+    vector_warm_load: bool = True  # Page the index into memory at startup
+    
+    # Multi-Tenancy (one collection per tenant, selected by the X-Tenant-ID header)
+    default_tenant_id: str = "default"  # Uses the original "documents" collection
+    tenant_collection_cache_size: int = 64  # Max open tenant collections
+    tenant_idle_seconds: int = 1800  # Close collections idle for longer
+    chroma_memory_limit_mb: int = 0  # >0 lets Chroma unload idle HNSW segments
+    
+    # Vector Store Process Mode
+    # "local": this process opens the store (single worker only)
+    # "client": queries go to `python -m app.services.index_server` over a Unix socket
+    vector_store_mode: str = "local"
+    vector_store_socket: str = "./vector_store.sock"
+    vector_store_timeout_seconds: float = 30.0
+    
+    # Vector Store Backend ("chroma" or "numpy")
+    vector_backend: str = "chroma"
+    numpy_index_path: str = "./numpy_index"
+    numpy_index_quantization: str = "float32"  # float32, float16 or int8
+    numpy_index_ivf_min_vectors: int = 50000  # Exact search below this size
+    numpy_index_ivf_nprobe: int = 8
+    numpy_index_compaction_ratio: float = 0.2  # Tombstone fraction that triggers compaction
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
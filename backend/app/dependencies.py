@@ -0,0 +1,116 @@
+from fastapi import Depends, Header, HTTPException, Request
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import hmac
+import ipaddress
+from app.config import settings
+from app.services.admission import admission_controller
+from app.services.vector_store import validate_tenant_id
+
+async def get_tenant_id(x_tenant_id: Optional[str] = Header(None)) -> str:
+    """
+    Resolve the tenant for a request from the X-Tenant-ID header.
+    
+    Args:
+        x_tenant_id: Header value; omitted means the default tenant
+    
+    Returns:
+        Validated tenant ID
+    """
+    try:
+        return validate_tenant_id(x_tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """
+    Check a token against the configured admin token.
+    
+    Args:
+        token: Value of the X-Admin-Token header
+    
+    Returns:
+        True if admin access is enabled and the token matches
+    """
+    if not settings.admin_token or not token:
+        return False
+    return hmac.compare_digest(token.encode(), settings.admin_token.encode())
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Guard for admin endpoints.
+    
+    Args:
+        x_admin_token: Header value
+    """
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@lru_cache(maxsize=8)
+def _trusted_networks(proxies: Tuple[str, ...]) -> List[ipaddress._BaseNetwork]:
+    """Parse the configured trusted proxies (cached per setting value)"""
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in proxies]
+
+def _is_trusted(address: str, networks: List[ipaddress._BaseNetwork]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+def client_address(request: Request) -> str:
+    """
+    Identify the client that sent a request.
+    
+    The peer address is used unless it is a trusted proxy. Then
+    X-Forwarded-For is walked from the right, past trusted hops, to the
+    first address the trusted proxies saw; hops further left are supplied
+    by the client and are not trusted.
+    
+    Args:
+        request: Incoming request
+    
+    Returns:
+        Client address
+    """
+    address = request.client.host if request.client else "unknown"
+    networks = _trusted_networks(tuple(settings.rate_limit_trusted_proxies))
+    if not networks or not _is_trusted(address, networks):
+        return address
+    
+    hops = [
+        hop.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for hop in header.split(",")
+        if hop.strip()
+    ]
+    for hop in reversed(hops):
+        address = hop
+        if not _is_trusted(hop, networks):
+            break
+    return address
+
+def rate_limited(route: str):
+    """
+    Build a dependency enforcing the per-client rate limit of a route.
+    
+    Clients are identified by tenant and address (see ``client_address``).
+    
+    Args:
+        route: "chat" or "upload"
+    
+    Returns:
+        Dependency raising 429 with Retry-After when the client is over its limit
+    """
+    async def check_rate_limit(request: Request, tenant_id: str = Depends(get_tenant_id)):
+        retry_after = admission_controller.check_rate(route, f"{tenant_id}:{client_address(request)}")
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+            )
+    
+    return check_rate_limit
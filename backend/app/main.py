@@ -1,8 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.config import settings
-from app.routes import chat, documents
+from app.dependencies import is_admin_token
+from app.routes import admin, chat, documents
+from app.services.document_service import document_service
+from app.services.profiler import profile_request, should_profile
+from app.services.vector_store import vector_store_service
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import logging
 
 # Configure logging
@@ -33,6 +39,60 @@ app.add_middleware(
 # Include routers
 app.include_router(chat.router)
 app.include_router(documents.router)
+app.include_router(admin.router)
+
+# Requests covered by sampled profiling
+PROFILED_ROUTES = {("POST", "/api/chat"), ("POST", "/api/documents/upload")}
+
+@app.middleware("http")
+async def profile_sampled_requests(request: Request, call_next):
+    """Profile a sample of chat and upload requests, or ones an admin asks for"""
+    route = (request.method, request.url.path.rstrip("/"))
+    if route not in PROFILED_ROUTES:
+        return await call_next(request)
+    
+    requested = (
+        request.headers.get("x-profile", "").lower() in ("1", "true")
+        and is_admin_token(request.headers.get("x-admin-token"))
+    )
+    if not should_profile(requested):
+        return await call_next(request)
+    
+    with profile_request(route[1], {"method": route[0], "path": route[1]}) as profile:
+        response = await call_next(request)
+    
+    if "profile_id" in profile:
+        response.headers["X-Profile-ID"] = profile["profile_id"]
+    return response
+
+@app.on_event("startup")
+async def warm_vector_index():
+    """Page the vector index into memory before the server accepts requests"""
+    if settings.vector_warm_load:
+        seconds = vector_store_service.warm()
+        logger.info(f"Vector index warm-load completed in {seconds:.2f}s")
+
+@app.on_event("startup")
+async def schedule_garbage_collection():
+    """Periodically reclaim orphaned uploads and chunks in the background"""
+    if settings.gc_interval_seconds <= 0:
+        return
+    
+    async def run_periodically():
+        while True:
+            await asyncio.sleep(settings.gc_interval_seconds)
+            try:
+                reports = await run_in_threadpool(document_service.collect_garbage_all)
+            except Exception as e:
+                logger.error(f"Garbage collection failed: {str(e)}")
+                continue
+            for report in reports:
+                reclaimed = report["orphan_files_deleted"] + report["orphan_chunks_deleted"]
+                if reclaimed:
+                    logger.info(f"Garbage collection reclaimed: {report}")
+    
+    # Keep a reference so the task is not garbage collected itself
+    app.state.gc_task = asyncio.create_task(run_periodically())
 
 @app.get("/")
 async def root():
@@ -66,9 +126,15 @@ async def global_exception_handler(request, exc):
 
 if __name__ == "__main__":
     import uvicorn
+    if settings.backend_workers > 1 and settings.vector_store_mode != "client":
+        raise SystemExit(
+            "Multiple workers need VECTOR_STORE_MODE=client and a running "
+            "`python -m app.services.index_server`"
+        )
     uvicorn.run(
         "app.main:app",
         host=settings.backend_host,
         port=settings.backend_port,
-        reload=True
+        workers=settings.backend_workers,
+        reload=settings.backend_workers == 1
     )
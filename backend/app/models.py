@@ -6,6 +6,8 @@ class ChatRequest(BaseModel):
     """Request model for chat endpoint"""
     query: str = Field(..., min_length=1, description="User's question")
     conversation_id: Optional[str] = Field(None, description="Conversation ID for context")
+    mmr_lambda: Optional[float] = Field(None, ge=0, le=1, description="Relevance vs. diversity of retrieved chunks (1 disables MMR)")
+    mmr_fetch_k: Optional[int] = Field(None, ge=1, description="Candidates MMR chooses from")
 
 class Source(BaseModel):
     """Source document reference"""
@@ -42,6 +44,21 @@ class DocumentListResponse(BaseModel):
     documents: List[DocumentInfo]
     total_count: int
 
+class BulkDeleteRequest(BaseModel):
+    """Request model for bulk document deletion (filters are combined with AND)"""
+    document_ids: Optional[List[str]] = Field(None, description="Delete these documents")
+    filename: Optional[str] = Field(None, description="Delete documents uploaded under this filename")
+    uploaded_after: Optional[datetime] = Field(None, description="Delete documents uploaded at or after this time")
+    uploaded_before: Optional[datetime] = Field(None, description="Delete documents uploaded before this time")
+
+class BulkDeleteResponse(BaseModel):
+    """Response model for bulk document deletion"""
+    documents_matched: int
+    chunks_deleted: int
+    files_deleted: int
+    status: str
+    timestamp: datetime = Field(default_factory=datetime.now)
+
 class ErrorResponse(BaseModel):
     """Error response model"""
     error: str
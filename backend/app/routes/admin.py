@@ -0,0 +1,81 @@
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.dependencies import get_tenant_id, require_admin
+from app.services.profiler import profile_store
+from app.services.snapshot import SNAPSHOT_DTYPES, snapshot_service
+from datetime import datetime
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/profiles")
+async def list_profiles():
+    """
+    List stored request profiles.
+    
+    Returns:
+        Profile metadata, newest first
+    """
+    profiles = profile_store.list()
+    return {"profiles": profiles, "total_count": len(profiles)}
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str):
+    """
+    Download a profile as collapsed stacks.
+    
+    Render with ``flamegraph.pl profile.collapsed > profile.svg`` or open
+    it in speedscope.
+    
+    Args:
+        profile_id: Profile ID from the listing
+    
+    Returns:
+        Collapsed-stack text file
+    """
+    path = profile_store.get_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.collapsed")
+
+@router.get("/snapshot")
+async def export_snapshot(dtype: str = "float32", tenant_id: str = Depends(get_tenant_id)):
+    """
+    Stream a snapshot of the tenant's chunks, metadata and embeddings.
+    
+    Args:
+        dtype: Embedding precision in the file ("float32" or "float16")
+        tenant_id: Tenant from the X-Tenant-ID header
+    
+    Returns:
+        Snapshot file
+    """
+    if dtype not in SNAPSHOT_DTYPES:
+        raise HTTPException(status_code=400, detail=f"dtype must be one of: {', '.join(SNAPSHOT_DTYPES)}")
+    
+    filename = f"{tenant_id}-{datetime.now().strftime('%Y%m%dT%H%M%S')}.kbsnap"
+    return StreamingResponse(
+        snapshot_service.iter_export(tenant_id, dtype=dtype),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/snapshot")
+async def import_snapshot(file: UploadFile = File(...), tenant_id: str = Depends(get_tenant_id)):
+    """
+    Load a snapshot into the tenant's (empty) collection without re-embedding.
+    
+    Args:
+        file: Snapshot file from the export endpoint or script
+        tenant_id: Tenant from the X-Tenant-ID header
+    
+    Returns:
+        Manifest of the imported snapshot
+    """
+    try:
+        manifest = await run_in_threadpool(snapshot_service.import_from_file, file.file, tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"status": "success", "manifest": manifest, "timestamp": datetime.now().isoformat()}
@@ -1,17 +1,21 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from app.dependencies import get_tenant_id, rate_limited, require_admin
 from app.models import ChatRequest, ChatResponse, ErrorResponse, Source
+from app.services.admission import AdmissionRejected, admission_controller
 from app.services.rag_service import rag_service
 from datetime import datetime
+import asyncio
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
-@router.post("/", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+@router.post("/", response_model=ChatResponse, dependencies=[Depends(rate_limited("chat"))])
+async def chat(request: ChatRequest, tenant_id: str = Depends(get_tenant_id)):
     """
     Process a chat query and return context-grounded response.
     
     Args:
         request: Chat request with query
+        tenant_id: Tenant from the X-Tenant-ID header
     
     Returns:
         Chat response with answer and sources
@@ -22,7 +26,12 @@ async def chat(request: ChatRequest):
             raise HTTPException(status_code=400, detail="Query cannot be empty")
         
         # Generate answer using RAG
-        result = rag_service.generate_answer(request.query)
+        result = await rag_service.generate_answer_coalesced(
+            request.query,
+            tenant_id=tenant_id,
+            mmr_lambda=request.mmr_lambda,
+            mmr_fetch_k=request.mmr_fetch_k
+        )
         
         # Format sources
         sources = [
@@ -43,12 +52,36 @@ async def chat(request: ChatRequest):
             timestamp=datetime.now()
         )
     
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": e.retry_after_header}
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail="Timed out waiting for the answer"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error processing query: {str(e)}"
         )
 
+@router.get("/stats", dependencies=[Depends(require_admin)])
+async def chat_stats():
+    """Pipeline counters for tuning (admin only: lists LLM endpoint URLs)"""
+    return {
+        "single_flight": rag_service.single_flight.get_stats(),
+        "llm": rag_service.llm_router.get_stats(),
+        "relevance_gate": rag_service.get_relevance_stats(),
+        "admission": admission_controller.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint for chat service"""
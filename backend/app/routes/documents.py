@@ -1,18 +1,25 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.models import DocumentUploadResponse, DocumentListResponse, DocumentInfo
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from starlette.concurrency import run_in_threadpool
+from app.dependencies import get_tenant_id, rate_limited, require_admin
+from app.models import (
+    DocumentUploadResponse, DocumentListResponse, DocumentInfo,
+    BulkDeleteRequest, BulkDeleteResponse
+)
+from app.services.admission import AdmissionRejected, admission_controller
 from app.services.document_service import document_service
 from datetime import datetime
 from typing import List
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 
-@router.post("/upload", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+@router.post("/upload", response_model=DocumentUploadResponse, dependencies=[Depends(rate_limited("upload"))])
+async def upload_document(file: UploadFile = File(...), tenant_id: str = Depends(get_tenant_id)):
     """
     Upload and process a document for the knowledge base.
     
     Args:
         file: Document file (PDF, DOCX, TXT)
+        tenant_id: Tenant from the X-Tenant-ID header
     
     Returns:
         Upload response with document info
@@ -28,8 +35,9 @@ async def upload_document(file: UploadFile = File(...)):
         )
     
     try:
-        # Process the upload
-        result = await document_service.process_upload(file)
+        # Process the upload in the ingestion pool, which yields to queued chat requests
+        async with admission_controller.ingest.slot():
+            result = await document_service.process_upload(file, tenant_id=tenant_id)
         
         return DocumentUploadResponse(
             document_id=result['document_id'],
@@ -39,6 +47,12 @@ async def upload_document(file: UploadFile = File(...)):
             message=f"Document processed successfully. Created {result['chunks_created']} chunks."
         )
     
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": e.retry_after_header}
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -48,15 +62,18 @@ async def upload_document(file: UploadFile = File(...)):
         )
 
 @router.get("/", response_model=DocumentListResponse)
-async def list_documents():
+async def list_documents(tenant_id: str = Depends(get_tenant_id)):
     """
     Get list of all documents in the knowledge base.
     
+    Args:
+        tenant_id: Tenant from the X-Tenant-ID header
+    
     Returns:
         List of documents with metadata
     """
     try:
-        documents = document_service.get_all_documents()
+        documents = document_service.get_all_documents(tenant_id=tenant_id)
         
         document_infos = [
             DocumentInfo(
@@ -80,19 +97,86 @@ async def list_documents():
             detail=f"Error fetching documents: {str(e)}"
         )
 
+@router.post("/bulk-delete", response_model=BulkDeleteResponse, dependencies=[Depends(require_admin)])
+async def bulk_delete_documents(request: BulkDeleteRequest, tenant_id: str = Depends(get_tenant_id)):
+    """
+    Delete every document matching the given filters (admin only).
+    
+    Args:
+        request: Document IDs, filename and/or upload date range
+        tenant_id: Tenant from the X-Tenant-ID header
+    
+    Returns:
+        Counts of matched documents, deleted chunks and deleted files
+    """
+    try:
+        result = await run_in_threadpool(
+            document_service.delete_documents,
+            document_ids=request.document_ids,
+            filename=request.filename,
+            uploaded_after=request.uploaded_after,
+            uploaded_before=request.uploaded_before,
+            tenant_id=tenant_id
+        )
+        return BulkDeleteResponse(status="success", **result)
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error deleting documents: {str(e)}"
+        )
+
+@router.post("/gc", dependencies=[Depends(require_admin)])
+async def collect_garbage(tenant_id: str = Depends(get_tenant_id)):
+    """
+    Reconcile the tenant's uploaded files with its vector store now (admin only).
+    
+    Args:
+        tenant_id: Tenant from the X-Tenant-ID header
+    
+    Returns:
+        Report of what was reclaimed
+    """
+    try:
+        return await run_in_threadpool(document_service.collect_garbage, tenant_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error collecting garbage: {str(e)}"
+        )
+
+@router.get("/gc")
+async def last_garbage_collection(tenant_id: str = Depends(get_tenant_id)):
+    """
+    Report from the tenant's most recent garbage collection pass.
+    
+    Args:
+        tenant_id: Tenant from the X-Tenant-ID header
+    
+    Returns:
+        Last report, or 404 if no pass has run in this process
+    """
+    report = document_service.last_gc_reports.get(tenant_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="No garbage collection has run yet")
+    return report
+
 @router.delete("/{document_id}")
-async def delete_document(document_id: str):
+async def delete_document(document_id: str, tenant_id: str = Depends(get_tenant_id)):
     """
     Delete a document from the knowledge base.
     
     Args:
         document_id: Document identifier
+        tenant_id: Tenant from the X-Tenant-ID header
     
     Returns:
         Deletion confirmation
     """
     try:
-        success = document_service.delete_document(document_id)
+        success = document_service.delete_document(document_id, tenant_id=tenant_id)
         
         if not success:
             raise HTTPException(
@@ -0,0 +1,252 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Optional
+from app.config import settings
+
+# Wait-time samples kept per pool for percentiles
+WAIT_WINDOW = 1000
+
+# Client buckets kept before the least recently seen are dropped
+MAX_RATE_LIMIT_CLIENTS = 10000
+
+def _percentile(values: List[float], percentile: float) -> float:
+    """Nearest-rank percentile of a list (0.0 when empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(percentile / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of queued"""
+    
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+    
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After value in whole seconds"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+class AdmissionPool:
+    """
+    Concurrency limit with a FIFO queue and early load shedding.
+    
+    The expected wait of a new arrival is estimated from the queue length
+    and the recent average service time; if it exceeds the SLO the request
+    is rejected immediately instead of timing out in the queue. A pool can
+    yield to a higher-priority pool: it starts no new work while that
+    pool has requests waiting.
+    """
+    
+    def __init__(self, name: str, concurrency: int, slo_seconds: float,
+                 yield_to: Optional["AdmissionPool"] = None):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.slo_seconds = slo_seconds
+        self.yield_to = yield_to
+        self._dependents: List["AdmissionPool"] = []
+        if yield_to is not None:
+            yield_to._dependents.append(self)
+        
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._service_seconds: Optional[float] = None
+        self._waits: Deque[float] = deque(maxlen=WAIT_WINDOW)
+        self.admitted = 0
+        self.rejected = 0
+    
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+    
+    def _blocked(self) -> bool:
+        return self.yield_to is not None and self.yield_to.queue_depth > 0
+    
+    def estimate_wait(self) -> float:
+        """
+        Expected queueing delay for a request arriving now.
+        
+        Returns:
+            Seconds (0.0 if a slot is free or no service times are known yet)
+        """
+        if self.in_flight < self.concurrency and not self._waiters and not self._blocked():
+            return 0.0
+        if self._service_seconds is None:
+            return 0.0
+        return (self.queue_depth + 1) * self._service_seconds / self.concurrency
+    
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold one slot of the pool for the enclosed work.
+        
+        Raises:
+            AdmissionRejected: If the estimated wait exceeds the SLO
+        """
+        estimate = self.estimate_wait()
+        if self.slo_seconds > 0 and estimate > self.slo_seconds:
+            self.rejected += 1
+            raise AdmissionRejected(
+                f"{self.name} is overloaded (estimated wait {estimate:.1f}s)",
+                retry_after=estimate
+            )
+        
+        queued_at = time.monotonic()
+        if self.in_flight < self.concurrency and not self._waiters and not self._blocked():
+            self.in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just as the caller gave up
+                    self._release()
+                else:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                    self._wake()
+                raise
+        
+        started = time.monotonic()
+        self._waits.append(started - queued_at)
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._service_seconds = (
+                elapsed if self._service_seconds is None
+                else 0.8 * self._service_seconds + 0.2 * elapsed
+            )
+            self._release()
+    
+    def _release(self):
+        self.in_flight -= 1
+        self._wake()
+    
+    def _wake(self):
+        """Hand free slots to queued requests, oldest first"""
+        while self._waiters and self.in_flight < self.concurrency and not self._blocked():
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+        
+        if not self._waiters:
+            # Lower-priority pools may have been holding back for us
+            for pool in self._dependents:
+                pool._wake()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Pool metrics.
+        
+        Returns:
+            Concurrency, queue depth, wait-time percentiles and counters
+        """
+        waits = list(self._waits)
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "estimated_wait_seconds": round(self.estimate_wait(), 3),
+            "slo_seconds": self.slo_seconds,
+            "avg_service_seconds": round(self._service_seconds or 0.0, 3),
+            "wait_p50_seconds": round(_percentile(waits, 50), 3),
+            "wait_p95_seconds": round(_percentile(waits, 95), 3),
+            "wait_p99_seconds": round(_percentile(waits, 99), 3),
+            "admitted": self.admitted,
+            "rejected": self.rejected
+        }
+
+class RateLimiter:
+    """Token bucket per client: ``rate_per_minute`` sustained, ``burst`` at once"""
+    
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.limited = 0
+    
+    def check(self, client: str) -> Optional[float]:
+        """
+        Take one token for a client.
+        
+        Args:
+            client: Client key
+        
+        Returns:
+            None if allowed, otherwise seconds until a token is available
+        """
+        if self.rate_per_second <= 0:
+            return None
+        
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate_per_second)
+        
+        if tokens >= 1.0:
+            tokens -= 1.0
+            retry_after = None
+        else:
+            retry_after = (1.0 - tokens) / self.rate_per_second
+            self.limited += 1
+        
+        self._buckets[client] = [tokens, now]
+        while len(self._buckets) > MAX_RATE_LIMIT_CLIENTS:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+class AdmissionController:
+    """Separate pools for interactive chat and background ingestion, plus per-client rate limits"""
+    
+    def __init__(self):
+        self.chat = AdmissionPool("chat", settings.chat_concurrency, settings.chat_queue_slo_seconds)
+        
+        # Ingestion starts nothing new while chat requests are queued
+        self.ingest = AdmissionPool(
+            "ingest", settings.ingest_concurrency, settings.ingest_queue_slo_seconds,
+            yield_to=self.chat
+        )
+        
+        self.rate_limiters = {
+            "chat": RateLimiter(settings.rate_limit_chat_per_minute, settings.rate_limit_burst),
+            "upload": RateLimiter(settings.rate_limit_upload_per_minute, settings.rate_limit_burst)
+        }
+    
+    def check_rate(self, route: str, client: str) -> Optional[float]:
+        """
+        Apply the per-client rate limit of a route.
+        
+        Args:
+            route: "chat" or "upload"
+            client: Client key
+        
+        Returns:
+            None if allowed, otherwise seconds until the client may retry
+        """
+        return self.rate_limiters[route].check(client)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Admission metrics for both pools and the rate limiters.
+        
+        Returns:
+            Dictionary of pool stats and rate-limited request counts
+        """
+        return {
+            "chat": self.chat.get_stats(),
+            "ingest": self.ingest.get_stats(),
+            "rate_limited": {route: limiter.limited for route, limiter in self.rate_limiters.items()}
+        }
+
+# Global instance
+admission_controller = AdmissionController()
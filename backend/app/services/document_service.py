@@ -1,13 +1,47 @@
+import asyncio
+import contextvars
+import logging
 import os
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Set
 from pathlib import Path
 import PyPDF2
 import docx
 from fastapi import UploadFile
 from app.config import settings
-from app.services.vector_store import vector_store_service
+from app.services.profiler import attach_current_thread
+from app.services.vector_store import vector_store_service, validate_tenant_id
+
+logger = logging.getLogger(__name__)
+
+# Written next to an upload while it is being ingested; holds the ingesting pid
+INGEST_MARKER_SUFFIX = ".ingesting"
+# Markers whose owner cannot be checked (no os.kill probe) expire after this long
+INGEST_MARKER_MAX_AGE_SECONDS = 24 * 3600
+
+def _process_alive(pid: int) -> bool:
+    """Best-effort check whether a process with this pid still exists"""
+    if pid == os.getpid():
+        return True
+    if os.name != "posix":
+        # os.kill would terminate the process on Windows; callers fall back to marker age
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _as_local_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Make a datetime comparable with the naive local ``upload_date`` values"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
 
 class DocumentService:
     """Service for processing and managing documents"""
@@ -15,29 +49,85 @@ class DocumentService:
     def __init__(self):
         self.upload_dir = Path(settings.upload_dir)
         self.upload_dir.mkdir(exist_ok=True)
+        
+        # Parsing and embedding threads, sized like the ingestion admission pool
+        self._ingest_executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.ingest_concurrency),
+            thread_name_prefix="ingest"
+        )
+        
+        # Reports from the most recent garbage collection pass, per tenant
+        self.last_gc_reports: Dict[str, Dict[str, Any]] = {}
+    
+    def get_upload_dir(self, tenant_id: Optional[str] = None) -> Path:
+        """
+        Get the upload directory for a tenant.
+        
+        The default tenant keeps using the top-level upload directory.
+        
+        Args:
+            tenant_id: Tenant identifier
+        
+        Returns:
+            Directory holding the tenant's uploaded files
+        """
+        tenant_id = validate_tenant_id(tenant_id)
+        if tenant_id == settings.default_tenant_id:
+            return self.upload_dir
+        
+        upload_dir = self.upload_dir / "tenants" / tenant_id
+        upload_dir.mkdir(parents=True, exist_ok=True)
+        return upload_dir
     
-    async def process_upload(self, file: UploadFile) -> Dict[str, Any]:
+    async def process_upload(self, file: UploadFile, tenant_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Process an uploaded file and add it to the vector store.
         
+        Parsing, chunking and embedding run on the ingestion thread pool,
+        so they never block the event loop serving chat requests.
+        
         Args:
             file: Uploaded file
+            tenant_id: Tenant that owns the document
         
         Returns:
             Processing result with document info
         """
+        content = await file.read()
+        
+        # Carry the request context so a profiled upload also samples the ingestion thread
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._ingest_executor, context.run, self._ingest, content, file.filename, tenant_id
+        )
+    
+    @attach_current_thread()
+    def _ingest(self, content: bytes, filename: str, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """Save, parse, chunk and embed one upload (runs on the ingestion pool)"""
         # Generate unique document ID
         document_id = str(uuid.uuid4())
         
+        upload_dir = self.get_upload_dir(tenant_id)
+        
+        # Mark the ingestion in flight before the file exists, so GC never sees it unmarked
+        marker = upload_dir / f"{document_id}{INGEST_MARKER_SUFFIX}"
+        marker.write_text(str(os.getpid()))
+        try:
+            return self._ingest_file(upload_dir, document_id, content, filename, tenant_id)
+        finally:
+            marker.unlink(missing_ok=True)
+    
+    def _ingest_file(self, upload_dir: Path, document_id: str, content: bytes,
+                     filename: str, tenant_id: Optional[str]) -> Dict[str, Any]:
+        """Write, parse, chunk and embed an upload under its in-flight marker"""
         # Save file
-        file_path = self.upload_dir / f"{document_id}_{file.filename}"
-        content = await file.read()
+        file_path = upload_dir / f"{document_id}_{filename}"
         
         with open(file_path, "wb") as f:
             f.write(content)
         
         # Extract text based on file type
-        text = self._extract_text(file_path, file.filename)
+        text = self._extract_text(file_path, filename)
         
         if not text or len(text.strip()) == 0:
             raise ValueError("No text content found in document")
@@ -50,7 +140,7 @@ class DocumentService:
         for i, chunk in enumerate(chunks):
             metadata = {
                 "document_id": document_id,
-                "filename": file.filename,
+                "filename": filename,
                 "chunk_index": i,
                 "total_chunks": len(chunks),
                 "upload_date": datetime.now().isoformat(),
@@ -59,11 +149,11 @@ class DocumentService:
             metadata_list.append(metadata)
         
         # Add to vector store
-        chunk_ids = vector_store_service.add_documents(chunks, metadata_list)
+        chunk_ids = vector_store_service.add_documents(chunks, metadata_list, tenant_id=tenant_id)
         
         return {
             "document_id": document_id,
-            "filename": file.filename,
+            "filename": filename,
             "chunks_created": len(chunks),
             "chunk_ids": chunk_ids,
             "file_size": len(content)
@@ -125,37 +215,303 @@ class DocumentService:
         except Exception as e:
             raise ValueError(f"Error reading TXT: {str(e)}")
     
-    def delete_document(self, document_id: str) -> bool:
+    def delete_document(self, document_id: str, tenant_id: Optional[str] = None) -> bool:
         """
         Delete a document and its chunks from the system.
         
         Args:
             document_id: Document identifier
+            tenant_id: Tenant that owns the document
         
         Returns:
             True if successful
         """
         # Delete from vector store
-        chunks_deleted = vector_store_service.delete_by_document_id(document_id)
+        chunks_deleted = vector_store_service.delete_by_document_id(document_id, tenant_id=tenant_id)
         
         # Delete file from disk
-        for file in self.upload_dir.glob(f"{document_id}_*"):
+        for file in self.get_upload_dir(tenant_id).glob(f"{document_id}_*"):
             file.unlink()
         
         return chunks_deleted > 0
     
-    def get_all_documents(self) -> List[Dict[str, Any]]:
+    def delete_documents(
+        self,
+        document_ids: Optional[List[str]] = None,
+        filename: Optional[str] = None,
+        uploaded_after: Optional[datetime] = None,
+        uploaded_before: Optional[datetime] = None,
+        tenant_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Delete every document matching the given filters.
+        
+        Filters are combined with AND. Chunks are removed first and files
+        last, so an interrupted delete leaves only files behind, which the
+        garbage collector reclaims.
+        
+        Args:
+            document_ids: Only these documents
+            filename: Only documents uploaded under this filename
+            uploaded_after: Only documents uploaded at or after this time
+            uploaded_before: Only documents uploaded before this time
+            tenant_id: Tenant that owns the documents
+        
+        Returns:
+            Counts of matched documents, deleted chunks and deleted files
+        """
+        if not document_ids and not filename and not uploaded_after and not uploaded_before:
+            raise ValueError("At least one filter is required for a bulk delete")
+        
+        if filename or uploaded_after or uploaded_before:
+            where = {}
+            if document_ids:
+                where["document_id"] = {"$in": list(document_ids)}
+            if filename:
+                where["filename"] = filename
+            if len(where) > 1:
+                where = {"$and": [{key: value} for key, value in where.items()]}
+            
+            # upload_date is an ISO string, which Chroma cannot range-filter
+            uploaded_after = _as_local_naive(uploaded_after)
+            uploaded_before = _as_local_naive(uploaded_before)
+            targets = []
+            for metadata in vector_store_service.find_documents(where or None, tenant_id=tenant_id):
+                uploaded = datetime.fromisoformat(metadata["upload_date"]) if metadata.get("upload_date") else None
+                if uploaded_after and (uploaded is None or uploaded < uploaded_after):
+                    continue
+                if uploaded_before and (uploaded is None or uploaded >= uploaded_before):
+                    continue
+                targets.append(metadata["document_id"])
+        else:
+            targets = list(dict.fromkeys(document_ids))
+        
+        chunks_deleted = vector_store_service.delete_by_document_ids(targets, tenant_id=tenant_id)
+        
+        # One directory scan instead of a glob per document
+        target_set = set(targets)
+        files_deleted = 0
+        for file in self.get_upload_dir(tenant_id).iterdir():
+            if file.is_file() and file.name.split("_", 1)[0] in target_set:
+                file.unlink(missing_ok=True)
+                files_deleted += 1
+        
+        return {
+            "documents_matched": len(targets),
+            "chunks_deleted": chunks_deleted,
+            "files_deleted": files_deleted
+        }
+    
+    def _ingesting_documents(self, upload_dir: Path) -> Set[str]:
+        """
+        Find documents whose ingestion is still in flight in some worker.
+        
+        Markers left behind by a worker that died mid-ingest are removed, so
+        their files become ordinary orphans.
+        
+        Args:
+            upload_dir: Tenant upload directory
+        
+        Returns:
+            Document IDs with a live ingestion marker
+        """
+        ingesting = set()
+        now = time.time()
+        for marker in upload_dir.glob(f"*{INGEST_MARKER_SUFFIX}"):
+            try:
+                pid = int(marker.read_text().strip() or 0)
+                age = now - marker.stat().st_mtime
+            except (OSError, ValueError):
+                # Being written or removed right now; treat as live this pass
+                ingesting.add(marker.name[:-len(INGEST_MARKER_SUFFIX)])
+                continue
+            if pid > 0 and _process_alive(pid) and age < INGEST_MARKER_MAX_AGE_SECONDS:
+                ingesting.add(marker.name[:-len(INGEST_MARKER_SUFFIX)])
+            else:
+                logger.warning(f"Removing stale ingestion marker {marker.name} (pid {pid})")
+                marker.unlink(missing_ok=True)
+        return ingesting
+    
+    def collect_garbage(self, tenant_id: Optional[str] = None,
+                        grace_seconds: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Reconcile a tenant's upload directory with its vector store.
+        
+        The document catalog is derived from chunk metadata, so reconciling
+        means:
+        - files with no chunks (failed upload or interrupted delete) are removed
+        - documents with fewer chunks than ``total_chunks`` are removed
+        - documents whose file is missing are reported but kept, since
+          their chunks still answer questions
+        - document-level vectors without chunks are removed
+        The catalog is scanned in pages, and a concurrent delete or compaction
+        shifts the offsets so the scan misses chunks; every deletion
+        candidate is therefore re-counted with a targeted query first.
+        Documents with a live ingestion marker are skipped however long they
+        take; the short grace period only covers uploads that start mid-pass.
+        
+        Args:
+            tenant_id: Tenant to reconcile
+            grace_seconds: Minimum age of reclaimed unmarked files and documents
+        
+        Returns:
+            Report of what was found and reclaimed
+        """
+        tenant_id = validate_tenant_id(tenant_id)
+        if grace_seconds is None:
+            grace_seconds = settings.gc_grace_seconds
+        started = time.perf_counter()
+        cutoff = time.time() - grace_seconds
+        upload_dir = self.get_upload_dir(tenant_id)
+        
+        # Read before anything else, so an ingestion that finishes mid-pass is still covered
+        ingesting = self._ingesting_documents(upload_dir)
+        
+        # Listed before the chunk scan: uploads add chunks before the document vector
+        indexed_documents = vector_store_service.get_indexed_document_ids(tenant_id=tenant_id)
+        
+        # Chunk counts and expected totals per document, read a page at a time
+        chunk_counts: Dict[str, int] = {}
+        documents: Dict[str, Dict[str, Any]] = {}
+        for page in vector_store_service.iter_chunk_metadata(tenant_id=tenant_id):
+            for metadata in page:
+                document_id = metadata.get("document_id")
+                if document_id is None:
+                    continue
+                chunk_counts[document_id] = chunk_counts.get(document_id, 0) + 1
+                documents.setdefault(document_id, metadata)
+        
+        files: Dict[str, List[Path]] = {}
+        for file in upload_dir.iterdir():
+            if file.is_file() and "_" in file.name:
+                files.setdefault(file.name.split("_", 1)[0], []).append(file)
+        
+        report = {
+            "tenant_id": tenant_id,
+            "orphan_files_deleted": 0,
+            "incomplete_documents_deleted": 0,
+            "orphan_chunks_deleted": 0,
+            "bytes_reclaimed": 0,
+            "documents_without_file": 0,
+            "stale_document_vectors_deleted": 0,
+            "documents_ingesting": len(ingesting)
+        }
+        
+        # Candidates from the paged scan, which a concurrent delete or compaction can
+        # make skip chunks; each is re-counted by a targeted query before deleting
+        stale_vectors = [d for d in indexed_documents if d not in chunk_counts]
+        orphan_files: Dict[str, List[Path]] = {}
+        for document_id, paths in files.items():
+            if document_id in chunk_counts or document_id in ingesting:
+                continue
+            old = [file for file in paths if file.stat().st_mtime < cutoff]
+            if old:
+                orphan_files[document_id] = old
+        
+        incomplete_candidates = []
+        for document_id, count in chunk_counts.items():
+            metadata = documents[document_id]
+            total = metadata.get("total_chunks")
+            if document_id in ingesting:
+                continue
+            if total is not None and count < total:
+                uploaded = metadata.get("upload_date")
+                if uploaded and datetime.fromisoformat(uploaded).timestamp() < cutoff:
+                    incomplete_candidates.append(document_id)
+            elif document_id not in files:
+                report["documents_without_file"] += 1
+        
+        current = vector_store_service.count_document_chunks(
+            list(set(stale_vectors) | set(orphan_files) | set(incomplete_candidates)),
+            tenant_id=tenant_id
+        )
+        
+        stale_vectors = [d for d in stale_vectors if current[d] == 0]
+        if stale_vectors:
+            vector_store_service.get_document_index(tenant_id).delete(ids=stale_vectors)
+            report["stale_document_vectors_deleted"] = len(stale_vectors)
+        
+        for document_id, paths in orphan_files.items():
+            if current[document_id] > 0:
+                continue
+            for file in paths:
+                try:
+                    size = file.stat().st_size
+                except FileNotFoundError:
+                    continue
+                file.unlink(missing_ok=True)
+                report["orphan_files_deleted"] += 1
+                report["bytes_reclaimed"] += size
+        
+        incomplete = [
+            d for d in incomplete_candidates
+            if current[d] < documents[d]["total_chunks"]
+        ]
+        if incomplete:
+            report["orphan_chunks_deleted"] = vector_store_service.delete_by_document_ids(
+                incomplete, tenant_id=tenant_id
+            )
+            report["incomplete_documents_deleted"] = len(incomplete)
+            for document_id in incomplete:
+                for file in files.get(document_id, []):
+                    try:
+                        size = file.stat().st_size
+                    except FileNotFoundError:
+                        continue
+                    file.unlink(missing_ok=True)
+                    report["orphan_files_deleted"] += 1
+                    report["bytes_reclaimed"] += size
+        
+        report["duration_seconds"] = round(time.perf_counter() - started, 3)
+        report["completed_at"] = datetime.now().isoformat()
+        self.last_gc_reports[tenant_id] = report
+        return report
+    
+    def list_tenants(self) -> List[str]:
+        """
+        List tenants that have uploads or (in local mode) a collection.
+        
+        Returns:
+            Tenant IDs, including the default tenant
+        """
+        tenants = {settings.default_tenant_id}
+        tenants_dir = self.upload_dir / "tenants"
+        if tenants_dir.exists():
+            tenants.update(p.name for p in tenants_dir.iterdir() if p.is_dir())
+        if vector_store_service.mode == "local":
+            tenants.update(vector_store_service.list_tenants())
+        return sorted(tenants)
+    
+    def collect_garbage_all(self) -> List[Dict[str, Any]]:
+        """
+        Run a garbage collection pass over every tenant.
+        
+        Returns:
+            One report per tenant
+        """
+        reports = []
+        for tenant_id in self.list_tenants():
+            try:
+                reports.append(self.collect_garbage(tenant_id))
+            except Exception as e:
+                logger.error(f"Garbage collection failed for tenant '{tenant_id}': {str(e)}")
+        return reports
+    
+    def get_all_documents(self, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Get information about all documents.
         
+        Args:
+            tenant_id: Tenant whose documents are listed
+        
         Returns:
             List of document information
         """
-        document_ids = vector_store_service.get_all_document_ids()
+        document_ids = vector_store_service.get_all_document_ids(tenant_id=tenant_id)
         documents = []
         
         for doc_id in document_ids:
-            metadata = vector_store_service.get_document_metadata(doc_id)
+            metadata = vector_store_service.get_document_metadata(doc_id, tenant_id=tenant_id)
             if metadata:
                 documents.append({
                     "document_id": doc_id,
@@ -0,0 +1,146 @@
+"""
+Single-writer vector store process.
+
+Owns the vector store (ChromaDB or the NumPy index) so several API workers
+can share one copy of the index. Workers run with VECTOR_STORE_MODE=client,
+compute embeddings themselves and send only vectors over a Unix socket.
+Reads are served concurrently; writes are serialized through one lock.
+
+Usage (from the backend directory):
+    python -m app.services.index_server
+    VECTOR_STORE_MODE=client uvicorn app.main:app --workers 4
+"""
+import logging
+import os
+import socket
+import socketserver
+import threading
+from typing import Any, Dict
+from app.config import settings
+from app.services.remote_vector_store import (
+    ALLOWED_METHODS,
+    WRITE_METHODS,
+    recv_message,
+    send_message,
+)
+from app.services.vector_store import VectorStoreService, vector_store_service
+
+logger = logging.getLogger(__name__)
+
+class IndexRequestHandler(socketserver.BaseRequestHandler):
+    """Serves requests from one worker connection until it closes"""
+    
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ConnectionError, OSError, ValueError):
+                return
+            if request is None:
+                return
+            send_message(self.request, self.server.index_server.dispatch(request))
+
+class IndexServer:
+    """Dispatches collection calls from API workers to the local vector store"""
+    
+    def __init__(self, service: VectorStoreService, socket_path: str):
+        self.service = service
+        self.socket_path = socket_path
+        self._write_lock = threading.Lock()
+    
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Execute one request against the tenant's collection.
+        
+        Args:
+            request: Message with tenant_id, method, kwargs and index
+        
+        Returns:
+            Response message with the result or the error
+        """
+        method = request.get("method")
+        tenant_id = request.get("tenant_id")
+        kwargs = request.get("kwargs") or {}
+        
+        try:
+            if method not in ALLOWED_METHODS:
+                raise ValueError(f"Unsupported vector store method: {method}")
+            
+            if method == "warm":
+                result = self.service.warm(tenant_id)
+            else:
+                if request.get("index") == "documents":
+                    collection = self.service.get_document_index(tenant_id)
+                else:
+                    collection = self.service.get_collection(tenant_id)
+                if method == "metadata":
+                    result = getattr(collection, "metadata", None)
+                elif method in WRITE_METHODS:
+                    with self._write_lock:
+                        result = getattr(collection, method)(**kwargs)
+                else:
+                    result = getattr(collection, method)(**kwargs)
+            
+            return {"ok": True, "result": result}
+        
+        except ValueError as e:
+            return {"ok": False, "type": "ValueError", "error": str(e)}
+        except Exception as e:
+            logger.error(f"Vector store request {method} failed: {str(e)}", exc_info=True)
+            return {"ok": False, "type": type(e).__name__, "error": str(e)}
+    
+    def _remove_stale_socket(self):
+        """Delete a socket file left by a dead server, refuse to start over a live one"""
+        if not os.path.exists(self.socket_path):
+            return
+        
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)
+        else:
+            raise RuntimeError(f"A vector store server is already listening on {self.socket_path}")
+        finally:
+            probe.close()
+    
+    def serve_forever(self):
+        """Listen on the Unix socket until interrupted"""
+        self._remove_stale_socket()
+        
+        server = socketserver.ThreadingUnixStreamServer(self.socket_path, IndexRequestHandler)
+        server.daemon_threads = True
+        server.index_server = self
+        os.chmod(self.socket_path, 0o660)
+        
+        logger.info(f"Vector store server ({self.service.backend}) listening on {self.socket_path}")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    # The server always owns the store, whatever mode the shared .env selects
+    if vector_store_service.mode == "local":
+        service = vector_store_service
+    else:
+        service = VectorStoreService(mode="local")
+    
+    if settings.vector_warm_load:
+        seconds = service.warm()
+        logger.info(f"Vector index warm-load completed in {seconds:.2f}s")
+    
+    try:
+        IndexServer(service, settings.vector_store_socket).serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
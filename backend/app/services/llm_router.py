@@ -0,0 +1,417 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+import httpx
+from langchain_openai import ChatOpenAI
+from app.config import settings
+from app.services.profiler import attach_current_thread
+
+logger = logging.getLogger(__name__)
+
+# Latency samples kept per endpoint for percentiles
+LATENCY_WINDOW = 500
+
+# Samples needed before the observed p95 replaces the default hedge delay
+MIN_HEDGE_SAMPLES = 20
+
+# Attempt threads per admitted chat call when llm_attempt_threads is 0: a primary
+# and a hedge, plus as many again for cancelled losers still draining their stream
+ATTEMPT_THREADS_PER_CALL = 4
+
+def _percentile(samples: List[float], percentile: float) -> Optional[float]:
+    """Nearest-rank percentile, or None without samples"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker.
+    
+    Opens after ``failure_threshold`` consecutive failures. After
+    ``reset_seconds`` it lets a single probe call through (half-open); the
+    probe's outcome closes or re-opens it. A probe that ends without an
+    outcome (cancelled after losing a hedge race) hands its reservation back.
+    """
+    
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe: Optional[int] = None
+        self._probes_issued = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+    
+    def acquire(self) -> Optional[int]:
+        """
+        Reserve a call if one may be sent now.
+        
+        Returns:
+            None if no call may be sent, 0 for a call through a closed
+            breaker, or a probe ticket (half-open) for ``release_probe``
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return 0
+            if state == "half_open" and self._probe is None:
+                self._probes_issued += 1
+                self._probe = self._probes_issued
+                return self._probe
+            return None
+    
+    def release_probe(self, ticket: int):
+        """Give back a probe reservation if it is still held (no outcome was recorded)"""
+        with self._lock:
+            if self._probe == ticket:
+                self._probe = None
+    
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probe = None
+    
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe = None
+            if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+class LLMEndpoint:
+    """One OpenAI-compatible chat model endpoint with its latency statistics"""
+    
+    def __init__(self, name: str, llm: Any, model: str, base_url: Optional[str] = None):
+        self.name = name
+        self.llm = llm
+        self.model = model
+        self.base_url = base_url
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.llm_circuit_failure_threshold,
+            reset_seconds=settings.llm_circuit_reset_seconds
+        )
+        self.calls = 0
+        self.failures = 0
+        self._first_token_seconds = deque(maxlen=LATENCY_WINDOW)
+        self._total_seconds = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+    
+    def hedge_delay(self) -> float:
+        """Seconds to wait for a first token before sending a hedged request"""
+        with self._lock:
+            samples = list(self._first_token_seconds)
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return settings.llm_hedge_default_delay_seconds
+        return max(0.05, _percentile(samples, settings.llm_hedge_percentile))
+    
+    def record_success(self, first_token_seconds: Optional[float], total_seconds: float):
+        with self._lock:
+            self.calls += 1
+            if first_token_seconds is not None:
+                self._first_token_seconds.append(first_token_seconds)
+            self._total_seconds.append(total_seconds)
+        self.breaker.record_success()
+    
+    def record_failure(self):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+        self.breaker.record_failure()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            first_token = list(self._first_token_seconds)
+            total = list(self._total_seconds)
+            calls = self.calls
+            failures = self.failures
+        return {
+            "name": self.name,
+            "model": self.model,
+            "base_url": self.base_url,
+            "circuit": self.breaker.state,
+            "calls": calls,
+            "failures": failures,
+            "first_token_p50_s": _percentile(first_token, 50),
+            "first_token_p95_s": _percentile(first_token, 95),
+            "first_token_p99_s": _percentile(first_token, 99),
+            "total_p50_s": _percentile(total, 50),
+            "total_p95_s": _percentile(total, 95),
+            "hedge_delay_s": self.hedge_delay()
+        }
+
+class _Attempt:
+    """One streamed request to one endpoint within a routed call"""
+    
+    def __init__(self, endpoint: LLMEndpoint, hedge: bool, probe: int = 0):
+        self.endpoint = endpoint
+        self.hedge = hedge
+        # Breaker probe ticket, 0 unless this attempt is a half-open probe
+        self.probe = probe
+        self.cancel = threading.Event()
+        self.finished = False
+
+class LLMRouter:
+    """
+    Routes prompts over an ordered list of LLM endpoints.
+    
+    Each call streams from the first available endpoint under a per-call
+    deadline. If no token has arrived by the endpoint's observed p95
+    time-to-first-token, a hedged request goes to the next endpoint (or the
+    same one when it is the only endpoint) and whichever streams first wins.
+    Failed attempts fail over down the list; endpoints with open circuit
+    breakers are skipped.
+    """
+    
+    def __init__(self, endpoints: List[LLMEndpoint]):
+        if not endpoints:
+            raise ValueError("At least one LLM endpoint is required")
+        self.endpoints = endpoints
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.failovers = 0
+        self.timeouts = 0
+        self.attempts_queued = 0
+        self._running: Set[_Attempt] = set()
+        self._stats_lock = threading.Lock()
+        self.attempt_threads = settings.llm_attempt_threads or ATTEMPT_THREADS_PER_CALL * settings.chat_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=self.attempt_threads, thread_name_prefix="llm-attempt")
+    
+    @classmethod
+    def from_settings(cls) -> "LLMRouter":
+        """
+        Build endpoints from ``llm_endpoints``, or from ``llm_model`` when that is empty.
+        
+        Returns:
+            Configured router
+        """
+        specs = settings.llm_endpoints or [{"name": "openai", "model": settings.llm_model}]
+        endpoints = []
+        
+        for i, spec in enumerate(specs):
+            model = spec.get("model", settings.llm_model)
+            base_url = spec.get("base_url")
+            timeout = spec.get("timeout", settings.llm_request_timeout_seconds)
+            llm = ChatOpenAI(
+                model=model,
+                temperature=settings.llm_temperature,
+                # Local stand-ins usually ignore the key but the client requires one
+                openai_api_key=spec.get("api_key") or settings.openai_api_key,
+                openai_api_base=base_url,
+                # A cancelled loser can only stop between reads, so a stalled stream
+                # must fail at the HTTP level instead of holding its thread until the deadline
+                request_timeout=httpx.Timeout(
+                    timeout, read=min(timeout, settings.llm_stall_timeout_seconds)
+                ),
+                # The router owns retries and failover
+                max_retries=0
+            )
+            endpoints.append(LLMEndpoint(spec.get("name", f"{model}-{i}"), llm, model, base_url))
+        
+        return cls(endpoints)
+    
+    def _next_endpoint(self, tried: List[LLMEndpoint]) -> Tuple[Optional[LLMEndpoint], int]:
+        """First untried endpoint whose breaker lets a call through, with its probe ticket"""
+        for endpoint in self.endpoints:
+            if endpoint in tried:
+                continue
+            probe = endpoint.breaker.acquire()
+            if probe is not None:
+                tried.append(endpoint)
+                return endpoint, probe
+        return None, 0
+    
+    @attach_current_thread()
+    def _run_attempt(self, attempt: _Attempt, prompt: str, deadline: float, events: queue.Queue):
+        """Run one attempt, then free its probe reservation and pool slot however it ended"""
+        try:
+            self._stream_attempt(attempt, prompt, deadline, events)
+        finally:
+            if attempt.probe:
+                # No-op if the outcome was recorded; frees it if the attempt was cancelled
+                attempt.endpoint.breaker.release_probe(attempt.probe)
+            with self._stats_lock:
+                self._running.discard(attempt)
+    
+    def _stream_attempt(self, attempt: _Attempt, prompt: str, deadline: float, events: queue.Queue):
+        """Stream one attempt, reporting first token, completion or error"""
+        endpoint = attempt.endpoint
+        started = time.monotonic()
+        first_token_at = None
+        parts = []
+        
+        try:
+            stream = endpoint.llm.stream(prompt)
+            try:
+                for chunk in stream:
+                    if attempt.cancel.is_set():
+                        return
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"LLM endpoint {endpoint.name} exceeded the call deadline")
+                    if chunk.content and first_token_at is None:
+                        first_token_at = time.monotonic()
+                        events.put((attempt, "first_token", None))
+                    parts.append(chunk.content)
+            finally:
+                close = getattr(stream, "close", None)
+                if close:
+                    close()
+            
+            if attempt.cancel.is_set():
+                return
+            endpoint.record_success(
+                first_token_at - started if first_token_at else None,
+                time.monotonic() - started
+            )
+            events.put((attempt, "done", "".join(parts)))
+        
+        except Exception as e:
+            if attempt.cancel.is_set():
+                return
+            endpoint.record_failure()
+            logger.warning(f"LLM endpoint {endpoint.name} failed: {str(e)}")
+            events.put((attempt, "error", e))
+    
+    def invoke(self, prompt: str) -> str:
+        """
+        Get a completion for a prompt.
+        
+        Args:
+            prompt: Full prompt text
+        
+        Returns:
+            The completion text
+        """
+        started = time.monotonic()
+        deadline = started + settings.llm_request_timeout_seconds
+        events: queue.Queue = queue.Queue()
+        attempts: List[_Attempt] = []
+        tried: List[LLMEndpoint] = []
+        winner: Optional[_Attempt] = None
+        last_error: Optional[Exception] = None
+        
+        def launch(endpoint: LLMEndpoint, hedge: bool = False, probe: int = 0):
+            attempt = _Attempt(endpoint, hedge, probe)
+            attempts.append(attempt)
+            with self._stats_lock:
+                if len(self._running) >= self.attempt_threads:
+                    # Waits for a thread, typically one held by a stalled loser
+                    self.attempts_queued += 1
+                self._running.add(attempt)
+            # Carry the request context so a profiled request also samples attempt threads
+            context = contextvars.copy_context()
+            self._executor.submit(context.run, self._run_attempt, attempt, prompt, deadline, events)
+        
+        def cancel_all(except_attempt: Optional[_Attempt] = None):
+            for attempt in attempts:
+                if attempt is not except_attempt:
+                    attempt.cancel.set()
+        
+        primary, probe = self._next_endpoint(tried)
+        if primary is None:
+            raise RuntimeError("All LLM endpoints are unavailable (circuit breakers open)")
+        launch(primary, probe=probe)
+        hedge_at = started + primary.hedge_delay()
+        hedged = not settings.llm_hedge_enabled
+        
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                for attempt in attempts:
+                    if not attempt.finished and not attempt.cancel.is_set():
+                        # A stall past the deadline counts against the endpoint
+                        attempt.endpoint.record_failure()
+                cancel_all()
+                with self._stats_lock:
+                    self.timeouts += 1
+                raise TimeoutError(
+                    f"No LLM response within {settings.llm_request_timeout_seconds}s"
+                )
+            
+            wait_until = deadline if winner or hedged else min(deadline, hedge_at)
+            try:
+                attempt, kind, payload = events.get(timeout=max(0.0, wait_until - now))
+            except queue.Empty:
+                if winner is None and not hedged and time.monotonic() >= hedge_at:
+                    hedged = True
+                    target, probe = self._next_endpoint(tried)
+                    if target is None and primary.breaker.state == "closed":
+                        target = primary
+                    if target is not None:
+                        launch(target, hedge=True, probe=probe)
+                        with self._stats_lock:
+                            self.hedges_sent += 1
+                continue
+            
+            if kind == "first_token":
+                if winner is None:
+                    winner = attempt
+                    cancel_all(except_attempt=attempt)
+                    if attempt.hedge:
+                        with self._stats_lock:
+                            self.hedges_won += 1
+                continue
+            
+            attempt.finished = True
+            
+            if kind == "done":
+                cancel_all(except_attempt=attempt)
+                return payload
+            
+            # kind == "error"
+            last_error = payload
+            if attempt is winner:
+                winner = None
+            running = [a for a in attempts if not a.finished and not a.cancel.is_set()]
+            if running:
+                continue
+            
+            endpoint, probe = self._next_endpoint(tried)
+            if endpoint is None:
+                raise RuntimeError(f"All LLM endpoints failed: {str(last_error)}")
+            with self._stats_lock:
+                self.failovers += 1
+            launch(endpoint, probe=probe)
+            primary = endpoint
+            hedge_at = time.monotonic() + endpoint.hedge_delay()
+            hedged = not settings.llm_hedge_enabled
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get routing counters and per-endpoint latency statistics.
+        
+        Returns:
+            Router counters, attempt pool usage and one entry per endpoint
+        """
+        with self._stats_lock:
+            counters = {
+                "hedges_sent": self.hedges_sent,
+                "hedges_won": self.hedges_won,
+                "failovers": self.failovers,
+                "timeouts": self.timeouts,
+                "attempt_threads": self.attempt_threads,
+                "attempts_running": len(self._running),
+                # Cancelled losers still holding a thread until their stream ends
+                "attempts_draining": sum(1 for a in self._running if a.cancel.is_set()),
+                "attempts_queued": self.attempts_queued
+            }
+        return {
+            **counters,
+            "endpoints": [endpoint.get_stats() for endpoint in self.endpoints]
+        }
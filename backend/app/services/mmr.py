@@ -0,0 +1,50 @@
+import numpy as np
+from typing import List, Sequence
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length (zero rows stay zero)"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+def mmr_select(query_embedding: Sequence[float], candidate_embeddings: Sequence[Sequence[float]],
+               k: int, lambda_mult: float = 0.5) -> List[int]:
+    """
+    Pick a relevant but diverse subset of candidates by maximal marginal relevance.
+    
+    Each step takes the candidate maximising
+    ``lambda_mult * sim(query, c) - (1 - lambda_mult) * max sim(c, selected)``
+    (cosine similarity). Similarities are computed as matrix-vector products:
+    one against the query, then one per selected candidate to update each
+    candidate's closest selected neighbour.
+    
+    Args:
+        query_embedding: Query vector
+        candidate_embeddings: Candidate vectors, one row per candidate
+        k: Number of candidates to select
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only
+    
+    Returns:
+        Indices into the candidates, in selection order
+    """
+    candidates = _normalize(np.asarray(candidate_embeddings, dtype=np.float32))
+    if len(candidates) == 0 or k <= 0:
+        return []
+    query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+    
+    relevance = candidates @ query
+    k = min(k, len(candidates))
+    
+    # Highest similarity of each candidate to anything already selected
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    selected = [int(np.argmax(relevance))]
+    
+    while len(selected) < k:
+        last = selected[-1]
+        available[last] = False
+        redundancy = np.maximum(redundancy, candidates @ candidates[last])
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        selected.append(int(np.argmax(scores)))
+    
+    return selected
@@ -0,0 +1,932 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Rows scored per matrix multiply, bounds the float32 scratch memory of a search
+SEARCH_BLOCK_ROWS = 65536
+
+# Spherical k-means iterations used to train the IVF partitions
+IVF_TRAIN_ITERATIONS = 10
+
+QUANTIZATION_DTYPES = {
+    "float32": np.float32,
+    "float16": np.float16,
+    "int8": np.int8,
+}
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a Chroma-style ``where`` filter against a metadata dict.
+    
+    Supports ``$and``/``$or`` and the ``$eq``, ``$ne``, ``$in``, ``$nin``,
+    ``$gt``, ``$gte``, ``$lt`` and ``$lte`` operators.
+    
+    Args:
+        metadata: Chunk metadata
+        where: Filter expression
+    
+    Returns:
+        True if the metadata satisfies the filter
+    """
+    if not where:
+        return True
+    
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+        
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        
+        for operator, operand in condition.items():
+            if operator == "$eq" and value != operand:
+                return False
+            if operator == "$ne" and value == operand:
+                return False
+            if operator == "$in" and value not in operand:
+                return False
+            if operator == "$nin" and value in operand:
+                return False
+            if operator in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if operator == "$gt" and not value > operand:
+                    return False
+                if operator == "$gte" and not value >= operand:
+                    return False
+                if operator == "$lt" and not value < operand:
+                    return False
+                if operator == "$lte" and not value <= operand:
+                    return False
+    
+    return True
+
+def _decode_rows(vectors: np.ndarray, scales: Optional[np.ndarray], rows: np.ndarray,
+                 dimension: int) -> np.ndarray:
+    """Dequantize stored rows back to float32"""
+    if len(rows) == 0:
+        return np.zeros((0, dimension or 0), dtype=np.float32)
+    decoded = vectors[rows].astype(np.float32)
+    if scales is not None:
+        decoded *= scales[rows][:, None]
+    return decoded
+
+def _score_rows(vectors: np.ndarray, scales: Optional[np.ndarray], rows: Optional[np.ndarray],
+                query: np.ndarray, start: int = 0, stop: int = 0) -> np.ndarray:
+    """
+    Compute cosine similarity between a query and stored rows.
+    
+    Args:
+        vectors: Stored matrix
+        scales: Per-row int8 scales, or None
+        rows: Explicit row indices, or None to score the ``start:stop`` range
+        query: Normalised float32 query vector
+        start: First row of the contiguous range
+        stop: End of the contiguous range
+    
+    Returns:
+        float32 similarities, one per scored row
+    """
+    if rows is None:
+        block = vectors[start:stop]
+        block_scales = scales[start:stop] if scales is not None else None
+    else:
+        block = vectors[rows]
+        block_scales = scales[rows] if scales is not None else None
+    
+    scores = block.astype(np.float32, copy=False) @ query
+    if block_scales is not None:
+        scores *= block_scales
+    return scores
+
+def _merge_top_k(best_rows, best_scores, rows, scores, k):
+    """Fold a scored block into the running top-k"""
+    rows = np.concatenate([best_rows, rows])
+    scores = np.concatenate([best_scores, scores])
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[keep], scores[keep]
+    return rows, scores
+
+class _IndexView:
+    """
+    Point-in-time view of an index, read without holding its lock.
+    
+    Rows below ``size`` never change in place: adds write past it, deletes
+    only clear ``live`` (copied here), and growth and compaction swap in new
+    memmaps and lists while the view keeps the old ones.
+    """
+    
+    def __init__(self, index: "NumpyVectorIndex"):
+        self.size = index._size
+        self.dimension = index.dimension
+        self.vectors = index._vectors
+        self.scales = index._scales
+        self.live = index._live[:index._size].copy()
+        self.ids = index._ids
+        self.documents = index._documents
+        self.metadatas = index._metadatas
+        self.document_rows = index._document_rows
+        self.centroids = index._centroids
+        self.lists = index._lists
+        self.nprobe = index.ivf_nprobe
+    
+    def decode(self, rows: np.ndarray) -> np.ndarray:
+        return _decode_rows(self.vectors, self.scales, rows, self.dimension)
+    
+    def filter_mask(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Boolean mask of live rows that satisfy ``where``"""
+        mask = self.live.copy()
+        document_ids = NumpyVectorIndex._document_id_filter(where)
+        if document_ids is not None:
+            # Common case (per-document and two-stage retrieval): skip the metadata scan
+            selected = np.zeros(self.size, dtype=bool)
+            for document_id in document_ids:
+                rows = self.document_rows.get(document_id)
+                if rows is not None:
+                    selected[rows] = True
+            return mask & selected
+        if where:
+            for row in np.flatnonzero(mask):
+                if not matches_where(self.metadatas[row], where):
+                    mask[row] = False
+        return mask
+    
+    def search(self, query: np.ndarray, k: int, mask: np.ndarray):
+        """
+        Return the top-k (rows, similarities) for a normalised query.
+        
+        Filtered queries that leave few candidates skip IVF and score the
+        surviving rows directly, so recall does not depend on the probe set.
+        """
+        candidate_count = int(mask.sum())
+        if candidate_count == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        
+        if candidate_count < self.size // 2 or self.centroids is None:
+            if candidate_count == self.size:
+                candidates = None
+            else:
+                candidates = np.flatnonzero(mask)
+        else:
+            candidates = self.probe(query)
+            candidates = candidates[mask[candidates]]
+            if len(candidates) < k:
+                candidates = np.flatnonzero(mask)
+        
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        if candidates is None:
+            for start in range(0, self.size, SEARCH_BLOCK_ROWS):
+                stop = min(start + SEARCH_BLOCK_ROWS, self.size)
+                scores = _score_rows(self.vectors, self.scales, None, query, start, stop)
+                best_rows, best_scores = _merge_top_k(
+                    best_rows, best_scores, np.arange(start, stop), scores, k
+                )
+        else:
+            for start in range(0, len(candidates), SEARCH_BLOCK_ROWS):
+                rows = candidates[start:start + SEARCH_BLOCK_ROWS]
+                scores = _score_rows(self.vectors, self.scales, rows, query)
+                best_rows, best_scores = _merge_top_k(best_rows, best_scores, rows, scores, k)
+        
+        order = np.argsort(-best_scores, kind="stable")
+        return best_rows[order], best_scores[order]
+    
+    def probe(self, query: np.ndarray) -> np.ndarray:
+        """Rows in the ``ivf_nprobe`` partitions closest to the query"""
+        nprobe = min(self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        nearest = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[i] for i in nearest])
+
+class NumpyVectorIndex:
+    """
+    In-process vector index stored as a contiguous memory-mapped matrix.
+    
+    Exposes the subset of the Chroma collection API used by
+    ``VectorStoreService`` (``add``, ``query``, ``get``, ``delete``,
+    ``count``), so either can sit behind the service. Vectors are
+    L2-normalised on insert and distances are cosine distances.
+    
+    Reads take a snapshot under the lock and scan outside it, so queries
+    run concurrently with each other, with writes and with compaction.
+    
+    On-disk layout inside ``path``:
+        manifest.json  dimension, quantization, used rows and capacity
+        vectors.bin    (capacity, dimension) matrix in the storage dtype
+        scales.bin     per-row dequantization scales (int8 only)
+        records.jsonl  append-only log of adds and tombstone deletes
+        ivf.npz        IVF centroids and row assignments, once trained
+    """
+    
+    # Distances are always 1 - cosine; reported like Chroma collection metadata
+    metadata = {"hnsw:space": "cosine"}
+    
+    def __init__(
+        self,
+        path: str,
+        quantization: str = "float32",
+        ivf_min_vectors: int = 50000,
+        ivf_nprobe: int = 8,
+        compaction_ratio: float = 0.2,
+    ):
+        if quantization not in QUANTIZATION_DTYPES:
+            raise ValueError(
+                f"Unsupported quantization {quantization}. "
+                f"Allowed: {', '.join(QUANTIZATION_DTYPES)}"
+            )
+        
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.ivf_min_vectors = ivf_min_vectors
+        self.ivf_nprobe = ivf_nprobe
+        self.compaction_ratio = compaction_ratio
+        
+        # Guards in-memory state; held briefly by readers to take a snapshot
+        self._lock = threading.RLock()
+        # Serializes compaction and IVF training, which run mostly outside ``_lock``
+        self._maintenance_lock = threading.Lock()
+        self._maintenance_thread: Optional[threading.Thread] = None
+        
+        self._manifest_path = self.path / "manifest.json"
+        self._vectors_path = self.path / "vectors.bin"
+        self._scales_path = self.path / "scales.bin"
+        self._records_path = self.path / "records.jsonl"
+        self._ivf_path = self.path / "ivf.npz"
+        
+        self.quantization = quantization
+        self.dimension: Optional[int] = None
+        self._size = 0
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        
+        self._ids: List[Optional[str]] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict[str, Any]]] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._live = np.zeros(0, dtype=bool)
+        
+        # document_id -> rows (including dead ones), built lazily for filtered queries
+        self._document_rows: Optional[Dict[Any, np.ndarray]] = None
+        self._deleted_count = 0
+        
+        # IVF state: centroids, per-row list assignment and lazily built lists
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists: Optional[List[np.ndarray]] = None
+        self._trained_size = 0
+        
+        self._load()
+        
+        # Compaction or training may have been pending when the process stopped
+        self._schedule_maintenance()
+    
+    def _load(self):
+        """Open the memory-mapped matrix, replay the record log and restore IVF state"""
+        if not self._manifest_path.exists():
+            return
+        
+        with open(self._manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        
+        if manifest["quantization"] != self.quantization:
+            raise ValueError(
+                f"Index at {self.path} uses {manifest['quantization']} quantization, "
+                f"not {self.quantization}. Rebuild it to change quantization."
+            )
+        
+        self.dimension = manifest["dimension"]
+        self._size = manifest["size"]
+        self._capacity = manifest["capacity"]
+        self._open_matrix()
+        
+        self._ids = [None] * self._size
+        self._documents = [None] * self._size
+        self._metadatas = [None] * self._size
+        self._live = np.zeros(self._capacity, dtype=bool)
+        self._assignments = np.full(self._capacity, -1, dtype=np.int32)
+        
+        if self._records_path.exists():
+            with open(self._records_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record["op"] == "add":
+                        row = record["row"]
+                        if row >= self._size:
+                            # Vectors for this row were never committed
+                            continue
+                        previous = self._ids[row]
+                        if previous is not None:
+                            # An uncommitted add from before a crash reused this row
+                            self._id_to_row.pop(previous, None)
+                        self._ids[row] = record["id"]
+                        self._documents[row] = record["document"]
+                        self._metadatas[row] = record["metadata"]
+                        self._id_to_row[record["id"]] = row
+                        self._live[row] = True
+                    elif record["op"] == "delete":
+                        for row in record["rows"]:
+                            if row < self._size and self._live[row]:
+                                self._live[row] = False
+                                self._id_to_row.pop(self._ids[row], None)
+        
+        self._deleted_count = self._size - int(self._live[:self._size].sum())
+        self._load_ivf()
+    
+    def _load_ivf(self):
+        """Restore persisted IVF centroids; rows added since they were saved are assigned now"""
+        if not self._ivf_path.exists():
+            return
+        try:
+            with np.load(self._ivf_path) as ivf:
+                centroids = ivf["centroids"]
+                assignments = ivf["assignments"]
+                trained_size = int(ivf["trained_size"])
+        except (OSError, ValueError, KeyError):
+            return
+        if centroids.ndim != 2 or centroids.shape[1] != self.dimension or len(assignments) > self._size:
+            return
+        
+        self._centroids = centroids.astype(np.float32)
+        self._assignments[:len(assignments)] = assignments
+        self._trained_size = trained_size
+        if len(assignments) < self._size:
+            self._assign_rows(np.arange(len(assignments), self._size))
+    
+    def _save_ivf(self, centroids: np.ndarray, assignments: np.ndarray, trained_size: int):
+        """Atomically persist IVF state (assignments cover rows ``0..len``)"""
+        tmp_path = self._ivf_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, centroids=centroids, assignments=assignments, trained_size=trained_size)
+        os.replace(tmp_path, self._ivf_path)
+    
+    def _open_matrix(self):
+        """(Re)open the vector and scale memmaps at the current capacity"""
+        dtype = QUANTIZATION_DTYPES[self.quantization]
+        self._vectors = np.memmap(
+            self._vectors_path, dtype=dtype, mode="r+",
+            shape=(self._capacity, self.dimension)
+        )
+        if self.quantization == "int8":
+            self._scales = np.memmap(
+                self._scales_path, dtype=np.float32, mode="r+",
+                shape=(self._capacity,)
+            )
+    
+    def _write_manifest(self):
+        """Atomically persist the manifest"""
+        manifest = {
+            "dimension": self.dimension,
+            "quantization": self.quantization,
+            "size": self._size,
+            "capacity": self._capacity,
+        }
+        tmp_path = self._manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+    
+    def _append_records(self, records: List[Dict[str, Any]]):
+        """Append entries to the record log"""
+        with open(self._records_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    
+    def _ensure_capacity(self, required: int):
+        """Grow the backing files (doubling) so ``required`` rows fit"""
+        if required <= self._capacity:
+            return
+        
+        new_capacity = max(required, self._capacity * 2, 1024)
+        # Snapshots keep their own handles, so only flush ours
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        if self._scales is not None:
+            self._scales.flush()
+            self._scales = None
+        
+        itemsize = np.dtype(QUANTIZATION_DTYPES[self.quantization]).itemsize
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dimension * itemsize)
+        if self.quantization == "int8":
+            with open(self._scales_path, "ab") as f:
+                f.truncate(new_capacity * np.dtype(np.float32).itemsize)
+        
+        self._live = np.concatenate(
+            [self._live, np.zeros(new_capacity - len(self._live), dtype=bool)]
+        )
+        self._assignments = np.concatenate(
+            [self._assignments,
+             np.full(new_capacity - len(self._assignments), -1, dtype=np.int32)]
+        )
+        self._capacity = new_capacity
+        self._open_matrix()
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """L2-normalise rows so dot products are cosine similarities"""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+    
+    def _encode(self, vectors: np.ndarray):
+        """
+        Convert normalised float32 rows to the storage dtype.
+        
+        Returns:
+            Tuple of (encoded rows, per-row scales or None)
+        """
+        if self.quantization == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            encoded = np.clip(np.rint(vectors / scales[:, None]), -127, 127)
+            return encoded.astype(np.int8), scales.astype(np.float32)
+        return vectors.astype(QUANTIZATION_DTYPES[self.quantization]), None
+    
+    def _view(self, where: Optional[Dict[str, Any]] = None) -> _IndexView:
+        """Snapshot for reading outside the lock (caller holds the lock)"""
+        if self._document_id_filter(where) is not None and self._document_rows is None:
+            self._document_rows = self._build_document_rows()
+        if self._centroids is not None and self._lists is None:
+            self._lists = self._build_lists()
+        return _IndexView(self)
+    
+    def count(self) -> int:
+        """Number of live vectors"""
+        with self._lock:
+            return self._size - self._deleted_count
+    
+    def add(
+        self,
+        ids: List[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ):
+        """
+        Append vectors with their documents and metadata.
+        
+        Args:
+            ids: Unique chunk identifiers
+            embeddings: One embedding per id
+            documents: Chunk texts
+            metadatas: Chunk metadata dicts
+        """
+        if not ids:
+            return
+        
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{} for _ in ids]
+        
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match "
+                    f"index dimension {self.dimension}"
+                )
+            
+            for chunk_id in ids:
+                if chunk_id in self._id_to_row:
+                    raise ValueError(f"ID {chunk_id} already exists in the index")
+            
+            start = self._size
+            stop = start + len(ids)
+            self._ensure_capacity(stop)
+            
+            encoded, scales = self._encode(vectors)
+            self._vectors[start:stop] = encoded
+            self._vectors.flush()
+            if scales is not None:
+                self._scales[start:stop] = scales
+                self._scales.flush()
+            
+            records = []
+            for offset, (chunk_id, document, metadata) in enumerate(
+                zip(ids, documents, metadatas)
+            ):
+                row = start + offset
+                self._ids.append(chunk_id)
+                self._documents.append(document)
+                self._metadatas.append(metadata)
+                self._id_to_row[chunk_id] = row
+                records.append({
+                    "op": "add",
+                    "row": row,
+                    "id": chunk_id,
+                    "document": document,
+                    "metadata": metadata,
+                })
+            
+            # Log first, then publish the new size: a crash in between only
+            # leaves log entries past ``size`` that the next load ignores
+            self._append_records(records)
+            self._size = stop
+            self._live[start:stop] = True
+            self._document_rows = None
+            self._write_manifest()
+            
+            if self._centroids is not None:
+                self._assign_rows(np.arange(start, stop))
+        
+        self._schedule_maintenance()
+    
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = ("metadatas", "documents", "distances"),
+    ) -> Dict[str, List[List[Any]]]:
+        """
+        Find the nearest stored vectors for each query embedding.
+        
+        Uses IVF partitions once trained, otherwise an exact blocked scan.
+        The scan runs on a snapshot, outside the index lock.
+        
+        Args:
+            query_embeddings: Query vectors
+            n_results: Results per query
+            where: Optional metadata filter
+            include: Fields to return besides ids
+        
+        Returns:
+            Chroma-shaped result dict with one list per query
+        """
+        queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32))
+        result: Dict[str, List[List[Any]]] = {"ids": []}
+        for field in include:
+            result[field] = []
+        
+        with self._lock:
+            view = self._view(where)
+        
+        mask = view.filter_mask(where)
+        for query in queries:
+            rows, scores = view.search(query, n_results, mask)
+            result["ids"].append([view.ids[r] for r in rows])
+            if "distances" in include:
+                result["distances"].append([float(1.0 - s) for s in scores])
+            if "documents" in include:
+                result["documents"].append([view.documents[r] for r in rows])
+            if "metadatas" in include:
+                result["metadatas"].append([view.metadatas[r] for r in rows])
+            if "embeddings" in include:
+                result["embeddings"].append(view.decode(rows).tolist())
+        
+        return result
+    
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Sequence[str] = ("metadatas", "documents"),
+    ) -> Dict[str, List[Any]]:
+        """
+        Fetch stored records by id and/or metadata filter.
+        
+        Args:
+            ids: Restrict to these ids
+            where: Metadata filter
+            limit: Maximum records to return
+            offset: Records to skip
+            include: Fields to return besides ids
+        
+        Returns:
+            Chroma-shaped result dict
+        """
+        with self._lock:
+            view = self._view(where)
+            if ids is not None:
+                rows = [self._id_to_row[i] for i in ids if i in self._id_to_row]
+        
+        if ids is not None:
+            if where:
+                rows = [r for r in rows if matches_where(view.metadatas[r], where)]
+        else:
+            rows = np.flatnonzero(view.filter_mask(where)).tolist()
+        
+        start = offset or 0
+        rows = rows[start:start + limit] if limit is not None else rows[start:]
+        
+        result: Dict[str, List[Any]] = {"ids": [view.ids[r] for r in rows]}
+        if "documents" in include:
+            result["documents"] = [view.documents[r] for r in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [view.metadatas[r] for r in rows]
+        if "embeddings" in include:
+            result["embeddings"] = view.decode(np.asarray(rows, dtype=np.int64)).tolist()
+        return result
+    
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+        """
+        Tombstone records by id and/or metadata filter.
+        
+        Space is reclaimed later by background compaction.
+        
+        Args:
+            ids: Ids to delete
+            where: Metadata filter selecting records to delete
+        """
+        with self._lock:
+            if ids is not None:
+                rows = [self._id_to_row[i] for i in ids if i in self._id_to_row]
+                if where:
+                    rows = [r for r in rows if matches_where(self._metadatas[r], where)]
+            else:
+                rows = np.flatnonzero(self._view(where).filter_mask(where)).tolist()
+            if not rows:
+                return
+            
+            self._append_records([{"op": "delete", "rows": rows}])
+            for row in rows:
+                self._live[row] = False
+                self._id_to_row.pop(self._ids[row], None)
+            self._deleted_count += len(rows)
+        
+        self._schedule_maintenance()
+    
+    @staticmethod
+    def _document_id_filter(where: Optional[Dict[str, Any]]) -> Optional[List[Any]]:
+        """Document IDs if ``where`` only selects by document_id, else None"""
+        if not where or len(where) != 1 or "document_id" not in where:
+            return None
+        condition = where["document_id"]
+        if not isinstance(condition, dict):
+            return [condition]
+        if len(condition) == 1 and "$eq" in condition:
+            return [condition["$eq"]]
+        if len(condition) == 1 and "$in" in condition:
+            return list(condition["$in"])
+        return None
+    
+    def _build_document_rows(self) -> Dict[Any, np.ndarray]:
+        """Group row numbers by their document_id metadata"""
+        grouped: Dict[Any, List[int]] = {}
+        for row, metadata in enumerate(self._metadatas[:self._size]):
+            if metadata and "document_id" in metadata:
+                grouped.setdefault(metadata["document_id"], []).append(row)
+        return {key: np.asarray(rows, dtype=np.int64) for key, rows in grouped.items()}
+    
+    def _build_lists(self) -> List[np.ndarray]:
+        """Group assigned rows by IVF list"""
+        assigned = self._assignments[:self._size]
+        order = np.argsort(assigned, kind="stable")
+        counts = np.bincount(assigned[assigned >= 0], minlength=len(self._centroids))
+        # Unassigned rows (-1) sort first; skip them
+        skip = int((assigned < 0).sum())
+        return np.split(order[skip:], np.cumsum(counts)[:-1])
+    
+    def _decode(self, rows: np.ndarray) -> np.ndarray:
+        """Dequantize stored rows back to float32 (caller holds the lock)"""
+        return _decode_rows(self._vectors, self._scales, rows, self.dimension)
+    
+    def _nearest_centroids(self, vectors: np.ndarray, scales: Optional[np.ndarray],
+                           rows: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """IVF list of each row, computed in blocks"""
+        assignments = np.empty(len(rows), dtype=np.int32)
+        for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+            block = rows[start:start + SEARCH_BLOCK_ROWS]
+            decoded = _decode_rows(vectors, scales, block, self.dimension)
+            assignments[start:start + len(block)] = np.argmax(decoded @ centroids.T, axis=1)
+        return assignments
+    
+    def _assign_rows(self, rows: np.ndarray):
+        """Assign rows to their nearest centroid (caller holds the lock)"""
+        self._assignments[rows] = self._nearest_centroids(
+            self._vectors, self._scales, rows, self._centroids
+        )
+        self._lists = None
+    
+    def _train_ivf(self):
+        """
+        Train spherical k-means centroids over a sample of live rows.
+        
+        Existing rows are assigned outside the index lock; rows added in the
+        meantime are assigned when the new centroids are swapped in.
+        """
+        with self._maintenance_lock:
+            with self._lock:
+                live_rows = np.flatnonzero(self._live[:self._size])
+                n_lists = int(min(4096, max(1, np.sqrt(len(live_rows)))))
+                rng = np.random.default_rng(0)
+                sample_size = min(len(live_rows), n_lists * 64)
+                sample_rows = np.sort(rng.choice(live_rows, sample_size, replace=False))
+                sample = self._decode(sample_rows)
+                view = self._view()
+            
+            centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+            for _ in range(IVF_TRAIN_ITERATIONS):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sample)
+                empty = np.bincount(assignment, minlength=n_lists) == 0
+                sums[empty] = centroids[empty]
+                centroids = self._normalize(sums)
+            centroids = centroids.astype(np.float32)
+            
+            assignments = self._nearest_centroids(
+                view.vectors, view.scales, np.arange(view.size), centroids
+            )
+            
+            with self._lock:
+                self._centroids = centroids
+                self._assignments[:view.size] = assignments
+                if self._size > view.size:
+                    self._assign_rows(np.arange(view.size, self._size))
+                self._lists = None
+                self._trained_size = self.count()
+                saved = (centroids, self._assignments[:self._size].copy(), self._trained_size)
+            
+            self._save_ivf(*saved)
+    
+    def _needs_compaction(self) -> bool:
+        return self._size > 0 and self._deleted_count / self._size >= self.compaction_ratio
+    
+    def _needs_training(self) -> bool:
+        live = self._size - self._deleted_count
+        if live < self.ivf_min_vectors:
+            return False
+        return self._centroids is None or live >= 2 * self._trained_size
+    
+    def _schedule_maintenance(self):
+        """Start the background compaction/training worker if work is pending"""
+        with self._lock:
+            if not (self._needs_compaction() or self._needs_training()):
+                return
+            if self._maintenance_thread is not None and self._maintenance_thread.is_alive():
+                return
+            self._maintenance_thread = threading.Thread(
+                target=self._run_maintenance, name="numpy-index-maintenance", daemon=True
+            )
+            self._maintenance_thread.start()
+    
+    def _run_maintenance(self):
+        if self._needs_compaction():
+            self.compact()
+        if self._needs_training():
+            self._train_ivf()
+    
+    def wait_for_maintenance(self):
+        """Block until any running background maintenance finishes"""
+        thread = self._maintenance_thread
+        if thread is not None:
+            thread.join()
+    
+    def compact(self):
+        """
+        Rewrite the matrix and record log without tombstoned rows.
+        
+        Live rows are copied into new files outside the index lock, so
+        queries and writes keep running. The lock is only held to copy the
+        rows added during the copy and to swap the new files in; rows
+        deleted during the copy stay as tombstones until the next pass.
+        """
+        with self._maintenance_lock:
+            with self._lock:
+                if self._deleted_count == 0:
+                    return
+                view = self._view()
+            
+            live_rows = np.flatnonzero(view.live)
+            capacity = max(1024, len(live_rows) * 2)
+            dtype = QUANTIZATION_DTYPES[self.quantization]
+            
+            vectors_tmp = self._vectors_path.with_suffix(".compact")
+            scales_tmp = self._scales_path.with_suffix(".compact")
+            records_tmp = self._records_path.with_suffix(".compact")
+            
+            new_vectors = np.memmap(
+                vectors_tmp, dtype=dtype, mode="w+", shape=(capacity, self.dimension)
+            )
+            for start in range(0, len(live_rows), SEARCH_BLOCK_ROWS):
+                block = live_rows[start:start + SEARCH_BLOCK_ROWS]
+                new_vectors[start:start + len(block)] = view.vectors[block]
+            new_scales = None
+            if view.scales is not None:
+                new_scales = np.memmap(
+                    scales_tmp, dtype=np.float32, mode="w+", shape=(capacity,)
+                )
+                new_scales[:len(live_rows)] = view.scales[live_rows]
+            
+            with open(records_tmp, "w", encoding="utf-8") as f:
+                for new_row, old_row in enumerate(live_rows):
+                    f.write(json.dumps({
+                        "op": "add",
+                        "row": new_row,
+                        "id": view.ids[old_row],
+                        "document": view.documents[old_row],
+                        "metadata": view.metadatas[old_row],
+                    }) + "\n")
+            
+            with self._lock:
+                # Catch up with rows appended while copying
+                tail = np.arange(view.size, self._size)
+                old_rows = np.concatenate([live_rows, tail])
+                new_size = len(old_rows)
+                if new_size > capacity:
+                    capacity = max(1024, new_size * 2)
+                    new_vectors.flush()
+                    new_vectors = self._regrow(vectors_tmp, dtype, capacity, (self.dimension,))
+                    if new_scales is not None:
+                        new_scales.flush()
+                        new_scales = self._regrow(scales_tmp, np.float32, capacity, ())
+                if len(tail):
+                    new_vectors[len(live_rows):new_size] = self._vectors[tail]
+                    if new_scales is not None:
+                        new_scales[len(live_rows):new_size] = self._scales[tail]
+                new_vectors.flush()
+                del new_vectors
+                if new_scales is not None:
+                    new_scales.flush()
+                    del new_scales
+                
+                live = self._live[old_rows]
+                with open(records_tmp, "a", encoding="utf-8") as f:
+                    for new_row in range(len(live_rows), new_size):
+                        old_row = old_rows[new_row]
+                        f.write(json.dumps({
+                            "op": "add",
+                            "row": new_row,
+                            "id": self._ids[old_row],
+                            "document": self._documents[old_row],
+                            "metadata": self._metadatas[old_row],
+                        }) + "\n")
+                    if not live.all():
+                        f.write(json.dumps({"op": "delete", "rows": np.flatnonzero(~live).tolist()}) + "\n")
+                
+                # Row numbers change, so saved IVF assignments go before the files do
+                if self._ivf_path.exists():
+                    os.remove(self._ivf_path)
+                
+                self._vectors = None
+                self._scales = None
+                os.replace(vectors_tmp, self._vectors_path)
+                if self.quantization == "int8":
+                    os.replace(scales_tmp, self._scales_path)
+                os.replace(records_tmp, self._records_path)
+                
+                self._ids = [self._ids[r] for r in old_rows]
+                self._documents = [self._documents[r] for r in old_rows]
+                self._metadatas = [self._metadatas[r] for r in old_rows]
+                self._id_to_row = {
+                    self._ids[row]: row for row in np.flatnonzero(live).tolist()
+                }
+                self._document_rows = None
+                
+                assignments = np.full(capacity, -1, dtype=np.int32)
+                assignments[:new_size] = self._assignments[old_rows]
+                self._assignments = assignments
+                self._lists = None
+                
+                self._live = np.zeros(capacity, dtype=bool)
+                self._live[:new_size] = live
+                self._size = new_size
+                self._capacity = capacity
+                self._deleted_count = int((~live).sum())
+                self._open_matrix()
+                self._write_manifest()
+                
+                saved = None
+                if self._centroids is not None:
+                    saved = (self._centroids, self._assignments[:self._size].copy(), self._trained_size)
+            
+            if saved is not None:
+                self._save_ivf(*saved)
+    
+    @staticmethod
+    def _regrow(path: Path, dtype, capacity: int, row_shape: tuple) -> np.memmap:
+        """Extend a compaction temp file to ``capacity`` rows and map it again"""
+        itemsize = np.dtype(dtype).itemsize * int(np.prod(row_shape, dtype=np.int64))
+        with open(path, "ab") as f:
+            f.truncate(capacity * itemsize)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(capacity,) + row_shape)
+    
+    def warm(self):
+        """Touch every page of the matrix so the first queries avoid page faults"""
+        with self._lock:
+            view = self._view()
+        if view.vectors is None:
+            return
+        for start in range(0, view.size, SEARCH_BLOCK_ROWS):
+            stop = min(start + SEARCH_BLOCK_ROWS, view.size)
+            np.asarray(view.vectors[start:stop]).sum()
@@ -0,0 +1,243 @@
+"""
+Sampled request profiling.
+
+A profiled request gets a background thread that periodically snapshots
+the Python stacks of the threads working on it (the event loop thread and
+any thread pool worker that attaches itself) and counts identical stacks.
+Profiles are written as collapsed stacks ("frame;frame;frame count"),
+which flamegraph.pl, speedscope and inferno read directly.
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Profile of the request being handled, inherited by thread pool calls
+_active_profiler: contextvars.ContextVar[Optional["SamplingProfiler"]] = contextvars.ContextVar(
+    "active_profiler", default=None
+)
+
+def _frame_label(frame) -> str:
+    """Readable, stable label for one stack frame"""
+    code = frame.f_code
+    filename = code.co_filename
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        filename = filename.split(marker, 1)[1]
+    else:
+        filename = os.path.relpath(filename) if os.path.isabs(filename) else filename
+    # Semicolons separate frames in the collapsed format
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+class SamplingProfiler:
+    """Statistical profiler for the threads attached to one request"""
+    
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.duration_seconds = 0.0
+        self._threads: Counter = Counter()
+        self._threads_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+    
+    def attach(self, thread_id: int):
+        """Include a thread in the samples until it is detached"""
+        with self._threads_lock:
+            self._threads[thread_id] += 1
+    
+    def detach(self, thread_id: int):
+        """Stop sampling a thread (attachments nest)"""
+        with self._threads_lock:
+            self._threads[thread_id] -= 1
+            if self._threads[thread_id] <= 0:
+                del self._threads[thread_id]
+    
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._sampler.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.duration_seconds = time.perf_counter() - self.started_at
+    
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            with self._threads_lock:
+                thread_ids = list(self._threads)
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+    
+    def collapsed(self) -> str:
+        """Profile in collapsed-stack format, heaviest stacks first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+@contextmanager
+def attach_current_thread():
+    """
+    Include the calling thread in the active request's profile, if any.
+    
+    Used by pipeline code that runs in the thread pool, where the request
+    context (and so the profiler) is inherited but the thread is not sampled.
+    """
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield
+        return
+    
+    thread_id = threading.get_ident()
+    profiler.attach(thread_id)
+    try:
+        yield
+    finally:
+        profiler.detach(thread_id)
+
+class ProfileStore:
+    """Profiles on disk, keeping only the most recent ``retention`` of them"""
+    
+    def __init__(self, directory: str, retention: int):
+        self.directory = Path(directory)
+        self.retention = retention
+        self._lock = threading.Lock()
+    
+    def save(self, profiler: SamplingProfiler, name: str, metadata: Dict[str, Any]) -> str:
+        """
+        Write a finished profile and prune old ones.
+        
+        Args:
+            profiler: Stopped profiler
+            name: Short label, e.g. the route
+            metadata: Extra fields for the listing
+        
+        Returns:
+            Profile ID
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        
+        (self.directory / f"{profile_id}.collapsed").write_text(profiler.collapsed(), encoding="utf-8")
+        info = {
+            "profile_id": profile_id,
+            "name": name,
+            "created_at": time.time(),
+            "duration_seconds": round(profiler.duration_seconds, 4),
+            "samples": profiler.samples,
+            "interval_seconds": profiler.interval_seconds,
+            **metadata
+        }
+        (self.directory / f"{profile_id}.json").write_text(json.dumps(info), encoding="utf-8")
+        
+        self._prune()
+        return profile_id
+    
+    def _prune(self):
+        with self._lock:
+            entries = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+            for path in entries[:max(0, len(entries) - self.retention)]:
+                path.unlink(missing_ok=True)
+                path.with_suffix(".collapsed").unlink(missing_ok=True)
+    
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        Stored profiles.
+        
+        Returns:
+            Profile metadata, newest first
+        """
+        if not self.directory.exists():
+            return []
+        profiles = []
+        for path in self.directory.glob("*.json"):
+            try:
+                profiles.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                # Pruned or half-written by another worker
+                continue
+        return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+    
+    def get_path(self, profile_id: str) -> Optional[Path]:
+        """
+        Location of a profile's collapsed stacks.
+        
+        Args:
+            profile_id: Profile ID from the listing
+        
+        Returns:
+            Path, or None if the profile does not exist
+        """
+        # IDs are generated here; anything else could escape the directory
+        if not profile_id.replace("-", "").replace("T", "").isalnum():
+            return None
+        path = self.directory / f"{profile_id}.collapsed"
+        return path if path.exists() else None
+
+def should_profile(requested: bool) -> bool:
+    """
+    Decide whether to profile a request.
+    
+    Args:
+        requested: An authenticated caller asked for a profile
+    
+    Returns:
+        True if the request should be profiled
+    """
+    return requested or (settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate)
+
+@contextmanager
+def profile_request(name: str, metadata: Optional[Dict[str, Any]] = None):
+    """
+    Profile the enclosed block plus thread pool work attached to it.
+    
+    Args:
+        name: Label stored with the profile
+        metadata: Extra fields stored with the profile
+    
+    Yields:
+        Dict that receives "profile_id" once the profile is saved
+    """
+    profiler = SamplingProfiler(settings.profile_interval_ms / 1000.0)
+    token = _active_profiler.set(profiler)
+    thread_id = threading.get_ident()
+    result: Dict[str, Any] = {}
+    
+    profiler.attach(thread_id)
+    profiler.start()
+    try:
+        yield result
+    finally:
+        profiler.stop()
+        profiler.detach(thread_id)
+        _active_profiler.reset(token)
+        try:
+            result["profile_id"] = profile_store.save(profiler, name, metadata or {})
+        except OSError as e:
+            logger.error(f"Could not store profile: {str(e)}")
+
+# Global instance
+profile_store = ProfileStore(settings.profile_dir, settings.profile_retention)
@@ -1,40 +1,125 @@
-from typing import Dict, Any, List
-from langchain_openai import ChatOpenAI
+from typing import Dict, Any, List, Optional
+from starlette.concurrency import run_in_threadpool
 from app.config import settings
-from app.services.vector_store import vector_store_service
+from app.services.admission import admission_controller
+from app.services.llm_router import LLMRouter
+from app.services.profiler import attach_current_thread
+from app.services.single_flight import SingleFlight
+from app.services.vector_store import vector_store_service, validate_tenant_id
 from app.system_prompt import format_context_prompt
+import threading
 import uuid
 
+REFUSAL_ANSWER = "I don't have enough information in the provided documents."
+
 class RAGService:
     """Service for RAG (Retrieval-Augmented Generation) operations"""
     
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model=settings.llm_model,
-            temperature=settings.llm_temperature,
-            openai_api_key=settings.openai_api_key
+        # Deadlines, hedging and failover across the configured LLM endpoints
+        self.llm_router = LLMRouter.from_settings()
+        
+        # Coalesces identical chat requests that are in flight at the same time
+        self.single_flight = SingleFlight()
+        
+        # Relevance gate counters, updated from thread pool workers
+        self._gate_lock = threading.Lock()
+        self._gate_stats = {
+            "queries": 0,
+            "llm_calls": 0,
+            "llm_calls_avoided": 0,
+            "chunks_retrieved": 0,
+            "chunks_dropped": 0
+        }
+    
+    async def generate_answer_coalesced(self, query: str, tenant_id: Optional[str] = None,
+                                        mmr_lambda: Optional[float] = None,
+                                        mmr_fetch_k: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Generate an answer, sharing one pipeline run among identical concurrent queries.
+        
+        Queries are keyed on their normalized text and retrieval scope
+        (tenant, top-k and MMR settings). The pipeline runs in the thread pool so the event
+        loop keeps accepting requests that can join it. Only the caller that
+        runs the pipeline takes a slot in the chat admission pool.
+        
+        Args:
+            query: User's question
+            tenant_id: Tenant whose documents ground the answer
+            mmr_lambda: Per-request MMR lambda (defaults to the setting)
+            mmr_fetch_k: Per-request MMR fetch size (defaults to the setting)
+        
+        Returns:
+            Dictionary containing answer and sources
+        
+        Raises:
+            AdmissionRejected: If the chat queue is over its wait-time SLO
+        """
+        tenant_id = validate_tenant_id(tenant_id)
+        if mmr_lambda is None:
+            mmr_lambda = settings.mmr_lambda
+        if mmr_fetch_k is None:
+            mmr_fetch_k = settings.mmr_fetch_k
+        
+        async def run():
+            async with admission_controller.chat.slot():
+                return await run_in_threadpool(
+                    self.generate_answer, query, tenant_id, mmr_lambda, mmr_fetch_k
+                )
+        
+        if not settings.chat_coalescing_enabled:
+            return await run()
+        
+        key = (
+            " ".join(query.lower().split()), tenant_id, settings.top_k_results,
+            mmr_lambda, min(mmr_fetch_k, settings.mmr_max_fetch_k)
+        )
+        result, shared = await self.single_flight.do(
+            key,
+            run,
+            timeout=settings.chat_coalesce_timeout_seconds,
+            run_timeout=settings.chat_coalesce_timeout_seconds
         )
+        
+        if shared and 'conversation_id' in result:
+            # Every caller still gets its own conversation
+            result = {**result, "conversation_id": str(uuid.uuid4())}
+        
+        return result
     
-    def generate_answer(self, query: str) -> Dict[str, Any]:
+    @attach_current_thread()
+    def generate_answer(self, query: str, tenant_id: Optional[str] = None,
+                        mmr_lambda: Optional[float] = None,
+                        mmr_fetch_k: Optional[int] = None) -> Dict[str, Any]:
         """
         Generate an answer to a query using RAG.
         
         Args:
             query: User's question
+            tenant_id: Tenant whose documents ground the answer
+            mmr_lambda: MMR lambda (defaults to the setting)
+            mmr_fetch_k: MMR fetch size (defaults to the setting)
         
         Returns:
             Dictionary containing answer and sources
         """
-        # Step 1: Retrieve relevant documents
+        # Step 1: Retrieve relevant, non-redundant documents
         search_results = vector_store_service.similarity_search(
             query, 
-            k=settings.top_k_results
+            k=settings.top_k_results,
+            tenant_id=tenant_id,
+            mmr_lambda=mmr_lambda,
+            fetch_k=mmr_fetch_k
         )
         
-        # Check if any documents were found
+        retrieved = len(search_results)
+        search_results = self._filter_relevant(search_results)
+        self._record_gate(retrieved, len(search_results))
+        
+        # Refuse without an LLM call when nothing relevant was found
         if not search_results:
             return {
-                "answer": "I don't have enough information in the provided documents.",
+                "answer": REFUSAL_ANSWER,
                 "sources": [],
                 "context_found": False
             }
@@ -46,8 +131,7 @@ class RAGService:
         prompt = format_context_prompt(context, query)
         
         # Step 4: Get LLM response
-        response = self.llm.invoke(prompt)
-        answer = response.content
+        answer = self.llm_router.invoke(prompt)
         
         # Step 5: Format sources
         sources = self._format_sources(search_results)
@@ -59,6 +143,55 @@ class RAGService:
             "conversation_id": str(uuid.uuid4())
         }
     
+    def _filter_relevant(self, search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Keep the chunks relevant enough to ground an answer.
+        
+        Chunks below ``relevance_threshold`` are dropped, as is the tail
+        scoring more than ``relevance_tail_margin`` below the best chunk.
+        
+        Args:
+            search_results: Retrieved documents, most relevant first
+        
+        Returns:
+            Retained documents (possibly none)
+        """
+        if settings.relevance_threshold > 0:
+            search_results = [
+                r for r in search_results
+                if r['relevance_score'] >= settings.relevance_threshold
+            ]
+        
+        if search_results and settings.relevance_tail_margin > 0:
+            cutoff = max(r['relevance_score'] for r in search_results) - settings.relevance_tail_margin
+            search_results = [r for r in search_results if r['relevance_score'] >= cutoff]
+        
+        return search_results
+    
+    def _record_gate(self, retrieved: int, kept: int):
+        """Update relevance gate counters for one query"""
+        with self._gate_lock:
+            self._gate_stats["queries"] += 1
+            self._gate_stats["chunks_retrieved"] += retrieved
+            self._gate_stats["chunks_dropped"] += retrieved - kept
+            if kept:
+                self._gate_stats["llm_calls"] += 1
+            else:
+                self._gate_stats["llm_calls_avoided"] += 1
+    
+    def get_relevance_stats(self) -> Dict[str, Any]:
+        """
+        Relevance gate counters since startup.
+        
+        Returns:
+            Dictionary of counters and the active thresholds
+        """
+        with self._gate_lock:
+            stats = dict(self._gate_stats)
+        stats["relevance_threshold"] = settings.relevance_threshold
+        stats["relevance_tail_margin"] = settings.relevance_tail_margin
+        return stats
+    
     def _format_context(self, search_results: List[Dict[str, Any]]) -> str:
         """
         Format search results into context string.
@@ -78,7 +211,7 @@ class RAGService:
             context_part = f"""
 Document {i}: {metadata.get('filename', 'Unknown')}
 (Chunk {metadata.get('chunk_index', 0) + 1} of {metadata.get('total_chunks', 1)})
-Relevance Score: {1 - result['score']:.2f}
+Relevance Score: {result['relevance_score']:.2f}
 
 Content:
 {content}
@@ -107,7 +240,7 @@ Content:
                 "document_name": metadata.get('filename', 'Unknown'),
                 "page": None,  # Could be extracted if PDF has page info
                 "chunk_id": metadata.get('document_id', ''),
-                "relevance_score": float(1 - result['score'])  # Convert distance to similarity
+                "relevance_score": result['relevance_score']
             }
             sources.append(source)
         
@@ -0,0 +1,180 @@
+import json
+import socket
+import struct
+import threading
+from typing import Any, Dict, List, Optional
+
+# Length prefix for every message on the index socket
+HEADER = struct.Struct(">I")
+
+# Refuse absurd frames rather than allocating for them
+MAX_MESSAGE_BYTES = 512 * 1024 * 1024
+
+# Collection methods the index server exposes
+ALLOWED_METHODS = {"add", "query", "get", "delete", "count", "warm", "metadata"}
+
+# Methods that modify a collection and must go through the single writer
+WRITE_METHODS = {"add", "delete"}
+
+def _encode_default(value: Any) -> Any:
+    """JSON fallback for NumPy scalars and arrays returned by the stores"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def send_message(sock: socket.socket, payload: Dict[str, Any]):
+    """
+    Send one length-prefixed JSON message.
+    
+    Args:
+        sock: Connected socket
+        payload: JSON-serializable message
+    """
+    data = json.dumps(payload, default=_encode_default).encode("utf-8")
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    """Read exactly ``size`` bytes or raise if the peer hangs up"""
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1024 * 1024))
+        if not chunk:
+            raise ConnectionError("Vector store socket closed")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+def recv_message(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    """
+    Receive one length-prefixed JSON message.
+    
+    Args:
+        sock: Connected socket
+    
+    Returns:
+        Decoded message, or None if the peer closed the connection cleanly
+    """
+    header = sock.recv(HEADER.size, socket.MSG_WAITALL)
+    if not header:
+        return None
+    if len(header) < HEADER.size:
+        header += _recv_exact(sock, HEADER.size - len(header))
+    
+    (size,) = HEADER.unpack(header)
+    if size > MAX_MESSAGE_BYTES:
+        raise ValueError(f"Vector store message of {size} bytes exceeds the limit")
+    return json.loads(_recv_exact(sock, size))
+
+class RemoteVectorStoreClient:
+    """Connection to the index server, with one socket per calling thread"""
+    
+    def __init__(self, socket_path: str, timeout: float):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+    
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise ConnectionError(
+                f"Cannot reach the vector store server at {self.socket_path}. "
+                f"Start it with `python -m app.services.index_server`: {e}"
+            )
+        return sock
+    
+    def call(self, tenant_id: str, method: str, kwargs: Dict[str, Any],
+             index: str = "chunks") -> Any:
+        """
+        Invoke a collection method on the index server.
+        
+        Args:
+            tenant_id: Tenant whose collection is targeted
+            method: Collection method name
+            kwargs: Keyword arguments for the method
+            index: "chunks" or "documents" (the document-level index)
+        
+        Returns:
+            The method's return value
+        """
+        request = {"tenant_id": tenant_id, "method": method, "kwargs": kwargs, "index": index}
+        
+        # A pooled socket may have been closed by a server restart; retry once
+        # on a fresh connection, but only for reads, which are safe to repeat
+        attempts = 1 if method in WRITE_METHODS else 2
+        for attempt in range(attempts):
+            sock = getattr(self._local, "sock", None)
+            if sock is None:
+                sock = self._connect()
+                self._local.sock = sock
+            try:
+                send_message(sock, request)
+                response = recv_message(sock)
+                if response is None:
+                    raise ConnectionError("Vector store server closed the connection")
+                break
+            except (ConnectionError, OSError):
+                sock.close()
+                self._local.sock = None
+                if attempt == attempts - 1:
+                    raise
+        
+        if not response["ok"]:
+            if response["type"] == "ValueError":
+                raise ValueError(response["error"])
+            raise RuntimeError(f"Vector store server error: {response['error']}")
+        return response["result"]
+
+class RemoteCollection:
+    """
+    Collection proxy that forwards the Chroma collection API to the index server.
+    
+    Used by API workers when ``vector_store_mode`` is ``client``: embeddings
+    are computed in the worker and only vectors travel over the socket.
+    """
+    
+    def __init__(self, client: RemoteVectorStoreClient, tenant_id: str, index: str = "chunks"):
+        self._client = client
+        self.tenant_id = tenant_id
+        self.index = index
+    
+    def _call(self, method: str, **kwargs) -> Any:
+        return self._client.call(self.tenant_id, method, kwargs, index=self.index)
+    
+    @property
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        return self._call("metadata")
+    
+    def count(self) -> int:
+        return self._call("count")
+    
+    def add(self, ids: List[str], embeddings: List[List[float]],
+            documents: Optional[List[str]] = None,
+            metadatas: Optional[List[Dict[str, Any]]] = None):
+        self._call("add", ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+    
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None,
+              include: Optional[List[str]] = None) -> Dict[str, Any]:
+        kwargs = {"query_embeddings": query_embeddings, "n_results": n_results, "where": where}
+        if include is not None:
+            kwargs["include"] = list(include)
+        return self._call("query", **kwargs)
+    
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Optional[List[str]] = None) -> Dict[str, Any]:
+        kwargs = {"ids": ids, "where": where, "limit": limit, "offset": offset}
+        if include is not None:
+            kwargs["include"] = list(include)
+        return self._call("get", **kwargs)
+    
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+        self._call("delete", ids=ids, where=where)
+    
+    def warm(self):
+        self._call("warm")
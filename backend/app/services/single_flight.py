@@ -0,0 +1,96 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one shared execution.
+    
+    The first caller for a key starts the work as its own task; callers
+    arriving while it runs await the same task. The key is released as soon
+    as the task finishes, so this never serves stale results - it only
+    absorbs bursts of duplicates that overlap in time.
+    
+    Waiters are shielded from each other: a waiter that is cancelled or
+    times out leaves the shared task running for the rest. The shared run
+    has its own deadline; when it passes, every waiter gets a timeout and
+    the key is released, so a stalled run stops absorbing new callers.
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.run_timeouts = 0
+        self.cancellations = 0
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]],
+                 timeout: Optional[float] = None,
+                 run_timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Run ``fn`` once per key among concurrent callers.
+        
+        Args:
+            key: Identity of the work; equal keys share one execution
+            fn: Coroutine factory doing the work
+            timeout: Seconds this caller waits before giving up
+            run_timeout: Seconds the shared execution may run before it is
+                cancelled and the key released
+        
+        Returns:
+            Tuple of (result, shared) where shared is True if this caller
+            joined an execution started by another caller
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        
+        if task is None:
+            task = asyncio.ensure_future(self._run(fn, run_timeout))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except asyncio.CancelledError:
+            self.cancellations += 1
+            raise
+        
+        return result, shared
+    
+    async def _run(self, fn: Callable[[], Awaitable[Any]], run_timeout: Optional[float]) -> Any:
+        try:
+            return await asyncio.wait_for(fn(), run_timeout)
+        except asyncio.TimeoutError:
+            self.run_timeouts += 1
+            raise
+    
+    def _release(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter gave up
+        if not task.cancelled():
+            task.exception()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get coalescing counters.
+        
+        Returns:
+            Executions started, calls coalesced onto them, waiter timeouts
+            and cancellations, shared runs that hit their deadline, and
+            executions currently in flight
+        """
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "run_timeouts": self.run_timeouts,
+            "cancellations": self.cancellations,
+            "in_flight": len(self._inflight)
+        }
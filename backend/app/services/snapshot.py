@@ -0,0 +1,233 @@
+import hashlib
+import json
+import struct
+import zlib
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+import numpy as np
+from app.config import settings
+from app.services.vector_store import VectorStoreService, vector_store_service, validate_tenant_id
+
+SNAPSHOT_FORMAT = "rag-kb-snapshot"
+SNAPSHOT_VERSION = 1
+MAGIC = b"RAGSNAP1"
+END_MAGIC = b"RAGSNAPE"
+LENGTH = struct.Struct(">I")
+SNAPSHOT_DTYPES = {"float32": "<f4", "float16": "<f2"}
+READ_BLOCK_BYTES = 1024 * 1024
+
+class SnapshotService:
+    """
+    Export and import a tenant's vector store without re-embedding.
+    
+    File layout (all segments are written as they are read from the store,
+    so memory stays bounded by one batch):
+        MAGIC
+        per batch: b"S" | header length | header JSON | vectors | records
+            vectors  rows x dimension matrix, little-endian float32/float16
+            records  zlib-compressed JSON list of [id, document, metadata]
+        b"M" | manifest JSON | manifest length | END_MAGIC
+    The manifest carries counts, the embedding model and a SHA-256 of
+    everything before the b"M" marker.
+    """
+    
+    def __init__(self, store: VectorStoreService):
+        self.store = store
+    
+    def iter_export(self, tenant_id: Optional[str] = None, batch_size: int = 1000,
+                    dtype: str = "float32") -> Iterator[bytes]:
+        """
+        Stream a tenant's chunks, metadata and embeddings as snapshot bytes.
+        
+        Args:
+            tenant_id: Tenant to export
+            batch_size: Chunks per segment
+            dtype: Stored embedding precision ("float32" or "float16")
+        
+        Yields:
+            Consecutive pieces of the snapshot file
+        """
+        if dtype not in SNAPSHOT_DTYPES:
+            raise ValueError(f"Unsupported snapshot dtype: {dtype}. Allowed: {', '.join(SNAPSHOT_DTYPES)}")
+        
+        tenant_id = validate_tenant_id(tenant_id)
+        digest = hashlib.sha256()
+        chunks = 0
+        segments = 0
+        dimension = None
+        documents = set()
+        
+        digest.update(MAGIC)
+        yield MAGIC
+        
+        for batch in self.store.iter_chunks(tenant_id, include=["embeddings", "documents", "metadatas"],
+                                            batch_size=batch_size):
+            vectors = np.asarray(batch['embeddings'], dtype=SNAPSHOT_DTYPES[dtype])
+            dimension = vectors.shape[1]
+            records = zlib.compress(json.dumps(
+                [list(record) for record in zip(batch['ids'], batch['documents'], batch['metadatas'])]
+            ).encode("utf-8"))
+            header = json.dumps({
+                "rows": len(batch['ids']),
+                "vector_bytes": vectors.nbytes,
+                "record_bytes": len(records)
+            }).encode("utf-8")
+            
+            for piece in (b"S", LENGTH.pack(len(header)), header, vectors.tobytes(), records):
+                digest.update(piece)
+                yield piece
+            
+            chunks += len(batch['ids'])
+            segments += 1
+            documents.update(m.get("document_id") for m in batch['metadatas'] if m)
+        
+        documents.discard(None)
+        manifest = json.dumps({
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "created_at": datetime.now().isoformat(),
+            "tenant_id": tenant_id,
+            "backend": self.store.backend,
+            "embedding_model": settings.embedding_model,
+            "distance_space": self.store.get_distance_space(tenant_id),
+            "dimension": dimension,
+            "dtype": dtype,
+            "chunks": chunks,
+            "documents": len(documents),
+            "segments": segments,
+            "sha256": digest.hexdigest()
+        }).encode("utf-8")
+        yield b"M" + manifest + LENGTH.pack(len(manifest)) + END_MAGIC
+    
+    def export_to_file(self, path: str, tenant_id: Optional[str] = None, batch_size: int = 1000,
+                       dtype: str = "float32") -> Dict[str, Any]:
+        """
+        Write a snapshot file.
+        
+        Args:
+            path: Destination file
+            tenant_id: Tenant to export
+            batch_size: Chunks per segment
+            dtype: Stored embedding precision
+        
+        Returns:
+            Snapshot manifest
+        """
+        with open(path, "wb") as f:
+            for piece in self.iter_export(tenant_id, batch_size=batch_size, dtype=dtype):
+                f.write(piece)
+        with open(path, "rb") as f:
+            return self.read_manifest(f)
+    
+    def read_manifest(self, f: BinaryIO) -> Dict[str, Any]:
+        """
+        Read and sanity-check the manifest at the end of a snapshot.
+        
+        Args:
+            f: Seekable snapshot file opened in binary mode
+        
+        Returns:
+            Manifest, plus "data_bytes": the length covered by the checksum
+        """
+        f.seek(0, 2)
+        size = f.tell()
+        trailer = LENGTH.size + len(END_MAGIC)
+        if size < len(MAGIC) + 1 + trailer:
+            raise ValueError("Not a knowledge base snapshot (file too small)")
+        
+        f.seek(0)
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a knowledge base snapshot (bad header)")
+        
+        f.seek(size - trailer)
+        (length,) = LENGTH.unpack(f.read(LENGTH.size))
+        if f.read(len(END_MAGIC)) != END_MAGIC or length > size - trailer:
+            raise ValueError("Snapshot is truncated (missing manifest)")
+        
+        f.seek(size - trailer - length - 1)
+        if f.read(1) != b"M":
+            raise ValueError("Snapshot is truncated (missing manifest)")
+        manifest = json.loads(f.read(length))
+        
+        if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot format: {manifest.get('format')} v{manifest.get('version')}")
+        
+        manifest["data_bytes"] = size - trailer - length - 1
+        return manifest
+    
+    def verify(self, f: BinaryIO) -> Dict[str, Any]:
+        """
+        Check a snapshot's checksum.
+        
+        Args:
+            f: Seekable snapshot file opened in binary mode
+        
+        Returns:
+            Manifest
+        """
+        manifest = self.read_manifest(f)
+        digest = hashlib.sha256()
+        f.seek(0)
+        remaining = manifest["data_bytes"]
+        while remaining > 0:
+            block = f.read(min(READ_BLOCK_BYTES, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+        
+        if remaining or digest.hexdigest() != manifest["sha256"]:
+            raise ValueError("Snapshot checksum mismatch; the file is corrupt or incomplete")
+        return manifest
+    
+    def import_from_file(self, f: BinaryIO, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Bulk-load a snapshot into an empty tenant collection.
+        
+        Stored embeddings are added directly, so nothing is sent to the
+        embedding API. The checksum is verified before anything is written.
+        
+        Args:
+            f: Seekable snapshot file opened in binary mode
+            tenant_id: Tenant to load into (need not match the exported one)
+        
+        Returns:
+            Manifest of the imported snapshot
+        """
+        manifest = self.verify(f)
+        
+        if manifest["embedding_model"] != settings.embedding_model:
+            raise ValueError(
+                f"Snapshot was embedded with {manifest['embedding_model']}, "
+                f"but this deployment uses {settings.embedding_model}"
+            )
+        
+        collection = self.store.get_collection(tenant_id)
+        if collection.count() > 0:
+            raise ValueError("Snapshots can only be imported into an empty collection")
+        
+        dtype = np.dtype(SNAPSHOT_DTYPES[manifest["dtype"]])
+        f.seek(len(MAGIC))
+        for _ in range(manifest["segments"]):
+            if f.read(1) != b"S":
+                raise ValueError("Snapshot segment is malformed")
+            (length,) = LENGTH.unpack(f.read(LENGTH.size))
+            header = json.loads(f.read(length))
+            
+            vectors = np.frombuffer(f.read(header["vector_bytes"]), dtype=dtype)
+            vectors = vectors.reshape(header["rows"], manifest["dimension"]).astype(np.float32)
+            records = json.loads(zlib.decompress(f.read(header["record_bytes"])))
+            
+            collection.add(
+                ids=[record[0] for record in records],
+                embeddings=vectors.tolist(),
+                documents=[record[1] for record in records],
+                metadatas=[record[2] for record in records]
+            )
+        
+        # Document vectors are derived from the imported chunk embeddings
+        self.store.build_document_index(tenant_id)
+        return manifest
+
+# Global instance
+snapshot_service = SnapshotService(vector_store_service)
@@ -1,16 +1,84 @@
 import chromadb
 from chromadb.config import Settings as ChromaSettings
-from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List, Dict, Any
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+import logging
+import re
+import threading
+import time
 import uuid
+import weakref
+import numpy as np
 from app.config import settings
+from app.services.mmr import mmr_select
+from app.services.numpy_index import NumpyVectorIndex
+from app.services.remote_vector_store import RemoteCollection, RemoteVectorStoreClient
+
+logger = logging.getLogger(__name__)
+
+# Chroma's values for HNSW parameters missing from collection metadata
+CHROMA_HNSW_DEFAULTS = {
+    "hnsw:space": "l2",
+    "hnsw:construction_ef": 100,
+    "hnsw:search_ef": 10,
+    "hnsw:M": 16
+}
+
+# Suffix of the per-tenant collection holding one vector per document
+DOCUMENT_INDEX_SUFFIX = "__docs"
+
+# Tenant IDs become part of collection names and paths, so keep them tame
+# "__" is reserved for derived collections (``__docs``, ``__rebuild``), so no
+# tenant's collection name can collide with another tenant's derived one
+TENANT_ID_PATTERN = re.compile(r"^(?!.*__)[A-Za-z0-9](?:[A-Za-z0-9_-]{0,38}[A-Za-z0-9])?$")
+
+def validate_tenant_id(tenant_id: Optional[str]) -> str:
+    """
+    Resolve and validate a tenant ID.
+    
+    Args:
+        tenant_id: Tenant ID, or None for the default tenant
+    
+    Returns:
+        The tenant ID to use
+    """
+    tenant_id = tenant_id or settings.default_tenant_id
+    if not TENANT_ID_PATTERN.match(tenant_id):
+        raise ValueError(
+            "Invalid tenant ID. Use 1-40 letters, digits, '-' or '_', "
+            "starting and ending with a letter or digit, without '__'"
+        )
+    return tenant_id
+
+def distance_to_relevance(distance: float, space: str) -> float:
+    """
+    Convert a vector store distance into a relevance score.
+    
+    Chroma's cosine distance is ``1 - cos``, its inner product distance is
+    ``1 - dot`` and its l2 distance is squared. Embeddings are normalized,
+    so every space maps onto cosine similarity (1.0 is identical).
+    
+    Args:
+        distance: Distance returned by the collection
+        space: Distance function of the collection (``hnsw:space``)
+    
+    Returns:
+        Relevance score in [-1, 1]
+    """
+    if space == "l2":
+        return 1.0 - distance / 2.0
+    if space in ("cosine", "ip"):
+        return 1.0 - distance
+    raise ValueError(f"Unsupported distance space: {space}")
 
 class VectorStoreService:
-    """Service for managing ChromaDB vector store operations"""
+    """Service for managing vector store operations (ChromaDB or in-process NumPy index)"""
     
-    def __init__(self):
+    def __init__(self, mode: Optional[str] = None):
         self.embeddings = OpenAIEmbeddings(
             model=settings.embedding_model,
             openai_api_key=settings.openai_api_key
@@ -23,111 +91,897 @@ class VectorStoreService:
             separators=["\n\n", "\n", ". ", " ", ""]
         )
         
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path=settings.vector_db_path,
-            settings=ChromaSettings(
-                anonymized_telemetry=False,
-                allow_reset=True
+        # The default tenant keeps the original collection name
+        self.collection_name = "documents"
+        self.backend = settings.vector_backend
+        
+        # "local" owns the store; "client" forwards to the index server process
+        self.mode = mode or settings.vector_store_mode
+        
+        # Open collection handles per tenant, least recently used first
+        self._collections: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._collections_lock = threading.Lock()
+        
+        # Per-handle locks (with their waiter counts) so a slow first open of one
+        # tenant only blocks callers of that tenant, never the global lock
+        self._open_locks: Dict[str, List[Any]] = {}
+        
+        # NumPy indexes by path, kept while anything still references them, so an
+        # index evicted from the LRU mid-upload is reused instead of opened twice
+        self._numpy_indexes: "weakref.WeakValueDictionary[str, NumpyVectorIndex]" = weakref.WeakValueDictionary()
+        self._numpy_indexes_lock = threading.Lock()
+        
+        if self.mode == "client":
+            self.client = None
+            self.remote = RemoteVectorStoreClient(
+                socket_path=settings.vector_store_socket,
+                timeout=settings.vector_store_timeout_seconds
+            )
+        elif self.mode != "local":
+            raise ValueError(
+                f"Unsupported vector store mode: {self.mode}. Allowed: local, client"
             )
+        elif self.backend == "numpy":
+            # Memory-mapped matrices exposing the Chroma collection API
+            self.client = None
+        elif self.backend == "chroma":
+            chroma_settings = {
+                "anonymized_telemetry": False,
+                "allow_reset": True
+            }
+            if settings.chroma_memory_limit_mb > 0:
+                # Let Chroma unload HNSW segments of idle tenants under memory pressure
+                chroma_settings["chroma_segment_cache_policy"] = "LRU"
+                chroma_settings["chroma_memory_limit_bytes"] = settings.chroma_memory_limit_mb * 1024 * 1024
+            
+            # Initialize ChromaDB client
+            self.client = chromadb.PersistentClient(
+                path=settings.vector_db_path,
+                settings=ChromaSettings(**chroma_settings)
+            )
+        else:
+            raise ValueError(
+                f"Unsupported vector backend: {self.backend}. Allowed: chroma, numpy"
+            )
+        
+        # Open the default tenant eagerly so configuration errors surface at startup
+        self.get_collection()
+    
+    def get_collection_name(self, tenant_id: Optional[str] = None) -> str:
+        """
+        Map a tenant to its collection name.
+        
+        Args:
+            tenant_id: Tenant identifier
+        
+        Returns:
+            Collection name
+        """
+        tenant_id = validate_tenant_id(tenant_id)
+        if tenant_id == settings.default_tenant_id:
+            return self.collection_name
+        return f"tenant_{tenant_id}"
+    
+    def get_collection(self, tenant_id: Optional[str] = None):
+        """
+        Get the collection for a tenant, opening it on first use.
+        
+        Handles are kept in an LRU capped at ``tenant_collection_cache_size``;
+        tenants idle for longer than ``tenant_idle_seconds`` are evicted.
+        
+        Args:
+            tenant_id: Tenant identifier
+        
+        Returns:
+            Chroma collection or NumpyVectorIndex
+        """
+        tenant_id = validate_tenant_id(tenant_id)
+        now = time.monotonic()
+        
+        with self._collections_lock:
+            self._evict_idle_collections(now)
+            collection = self._cached_collection(tenant_id, now)
+        if collection is not None:
+            return collection
+        
+        with self._opening(tenant_id):
+            with self._collections_lock:
+                collection = self._cached_collection(tenant_id, now)
+            if collection is not None:
+                return collection
+            
+            # Opening can replay a whole NumPy index; done outside the global lock
+            opened = self._open_collection(tenant_id)
+            
+            with self._collections_lock:
+                self._collections[tenant_id] = {"collection": opened, "last_used": now}
+                while len(self._collections) > max(1, settings.tenant_collection_cache_size):
+                    # The default tenant stays open, like with idle eviction
+                    evicted = next(
+                        (t for t in self._collections
+                         if t not in (settings.default_tenant_id, tenant_id)),
+                        None
+                    )
+                    if evicted is None:
+                        break
+                    del self._collections[evicted]
+                    logger.info(f"Evicted collection for tenant '{evicted}' (cache full)")
+                return opened
+    
+    def _cached_collection(self, tenant_id: str, now: float):
+        """Return an open handle and mark it used, or None (caller holds the lock)"""
+        entry = self._collections.get(tenant_id)
+        if entry is None:
+            return None
+        entry["last_used"] = now
+        self._collections.move_to_end(tenant_id)
+        return entry["collection"]
+    
+    @contextmanager
+    def _opening(self, key: str):
+        """
+        Serialize first opens of one handle.
+        
+        Callers opening other handles are not blocked; the lock is dropped
+        once its last waiter is done.
+        
+        Args:
+            key: Tenant ID or index path
+        """
+        with self._collections_lock:
+            entry = self._open_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._collections_lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._open_locks[key]
+    
+    def get_document_index(self, tenant_id: Optional[str] = None):
+        """
+        Get the document-level index for a tenant, opening it on first use.
+        
+        It holds one vector per document (the normalized centroid of its
+        chunk embeddings) and shares the LRU entry of the chunk collection.
+        
+        Args:
+            tenant_id: Tenant identifier
+        
+        Returns:
+            Chroma collection, NumpyVectorIndex or RemoteCollection
+        """
+        tenant_id = validate_tenant_id(tenant_id)
+        self.get_collection(tenant_id)
+        
+        with self._collections_lock:
+            entry = self._collections.get(tenant_id)
+            if entry is not None and "document_index" in entry:
+                return entry["document_index"]
+        
+        with self._opening(tenant_id + DOCUMENT_INDEX_SUFFIX):
+            with self._collections_lock:
+                entry = self._collections.get(tenant_id)
+                if entry is not None and "document_index" in entry:
+                    return entry["document_index"]
+            
+            document_index = self._open_document_index(tenant_id)
+            
+            with self._collections_lock:
+                entry = self._collections.get(tenant_id)
+                if entry is None:
+                    # Evicted in between; serve this call without caching
+                    return document_index
+                return entry.setdefault("document_index", document_index)
+    
+    def _open_document_index(self, tenant_id: str):
+        """Open (or create) the document-level index for a validated tenant"""
+        if self.mode == "client":
+            return RemoteCollection(self.remote, tenant_id, index="documents")
+        if self.backend == "numpy":
+            return self._open_numpy_index(self._numpy_index_path(tenant_id) / "document_index")
+        return self.client.get_or_create_collection(
+            name=self.get_collection_name(tenant_id) + DOCUMENT_INDEX_SUFFIX,
+            metadata=self.get_hnsw_metadata(),
+            embedding_function=None
         )
+    
+    def get_distance_space(self, tenant_id: Optional[str] = None) -> str:
+        """
+        Distance function a tenant's collection was created with.
         
-        # Initialize or get collection
-        self.collection_name = "documents"
+        Collections keep the space they were built with, which may not
+        match ``hnsw_space`` in settings; the value is cached with the handle.
+        
+        Args:
+            tenant_id: Tenant identifier
+        
+        Returns:
+            "cosine", "l2" or "ip"
+        """
+        tenant_id = validate_tenant_id(tenant_id)
+        collection = self.get_collection(tenant_id)
+        
+        with self._collections_lock:
+            entry = self._collections.get(tenant_id)
+            if entry is not None and "space" in entry:
+                return entry["space"]
+        
+        space = (collection.metadata or {}).get("hnsw:space", CHROMA_HNSW_DEFAULTS["hnsw:space"])
+        
+        with self._collections_lock:
+            # A rebuild swaps in a new entry, so only cache on the one we read
+            if entry is not None and self._collections.get(tenant_id) is entry:
+                entry["space"] = space
+        
+        return space
+    
+    def _evict_idle_collections(self, now: float):
+        """Drop handles of tenants idle past the TTL (caller holds the lock)"""
+        cutoff = now - settings.tenant_idle_seconds
+        for tenant_id in list(self._collections):
+            if tenant_id == settings.default_tenant_id:
+                continue
+            if self._collections[tenant_id]["last_used"] < cutoff:
+                # In-flight users keep their reference; memory is freed when they finish
+                del self._collections[tenant_id]
+                logger.info(f"Evicted collection for tenant '{tenant_id}' (idle)")
+    
+    def get_open_tenants(self) -> List[str]:
+        """
+        List tenants with an open collection handle.
+        
+        Returns:
+            Tenant IDs, least recently used first
+        """
+        with self._collections_lock:
+            return list(self._collections)
+    
+    def _open_collection(self, tenant_id: str):
+        """Open (or create) the backing collection for a validated tenant"""
+        if self.mode == "client":
+            return RemoteCollection(self.remote, tenant_id)
+        if self.backend == "numpy":
+            return self._open_numpy_index(self._numpy_index_path(tenant_id))
+        return self._open_chroma_collection(self.get_collection_name(tenant_id))
+    
+    def _open_numpy_index(self, path: Path) -> NumpyVectorIndex:
+        """
+        Open a NumPy index, sharing the instance already open on that path.
+        
+        Evicting a handle from the LRU doesn't close it: in-flight requests
+        and the maintenance thread may still use it. Two instances on the
+        same files would append at the same rows, so a reopen while the old
+        one is alive returns it instead.
+        
+        Args:
+            path: Index directory
+        
+        Returns:
+            NumpyVectorIndex
+        """
+        key = str(path.resolve())
+        with self._opening(key):
+            with self._numpy_indexes_lock:
+                index = self._numpy_indexes.get(key)
+            if index is not None:
+                return index
+            
+            # Replays the record log; only callers of this path wait for it
+            index = NumpyVectorIndex(
+                path=str(path),
+                quantization=settings.numpy_index_quantization,
+                ivf_min_vectors=settings.numpy_index_ivf_min_vectors,
+                ivf_nprobe=settings.numpy_index_ivf_nprobe,
+                compaction_ratio=settings.numpy_index_compaction_ratio
+            )
+            with self._numpy_indexes_lock:
+                self._numpy_indexes[key] = index
+            return index
+    
+    def _numpy_index_path(self, tenant_id: str) -> Path:
+        """Directory of a validated tenant's NumPy index"""
+        path = Path(settings.numpy_index_path)
+        if tenant_id != settings.default_tenant_id:
+            path = path / "tenants" / tenant_id
+        return path
+    
+    def get_hnsw_metadata(self) -> Dict[str, Any]:
+        """HNSW parameters from settings, as Chroma collection metadata"""
+        return {
+            "hnsw:space": settings.hnsw_space,
+            "hnsw:construction_ef": settings.hnsw_construction_ef,
+            "hnsw:search_ef": settings.hnsw_search_ef,
+            "hnsw:M": settings.hnsw_m
+        }
+    
+    def _open_chroma_collection(self, name: str):
+        """
+        Get a Chroma collection, creating it with the configured HNSW parameters.
+        
+        HNSW parameters are fixed when a collection is created, so an existing
+        collection built with different ones is used as-is and a warning points
+        at ``rebuild_collection``.
+        
+        Args:
+            name: Collection name
+        
+        Returns:
+            Chroma collection
+        """
+        rebuild_name = f"{name}__rebuild"
+        
+        # Embeddings are computed here, so Chroma needs no embedding function
+        try:
+            collection = self.client.get_collection(
+                name=name,
+                embedding_function=None
+            )
+        except ValueError:
+            try:
+                # A rebuild was interrupted after dropping the old collection
+                collection = self.client.get_collection(
+                    name=rebuild_name,
+                    embedding_function=None
+                )
+                collection.modify(name=name)
+                logger.warning(f"Recovered collection '{name}' from an interrupted rebuild")
+                return collection
+            except ValueError:
+                return self.client.create_collection(
+                    name=name,
+                    metadata=self.get_hnsw_metadata(),
+                    embedding_function=None
+                )
+        
+        drift = self.get_hnsw_drift(collection)
+        if drift:
+            logger.warning(
+                f"Collection '{name}' was built with HNSW parameters "
+                f"{drift} that differ from settings; "
+                f"run `python -m scripts.rebuild_vector_index` to apply them"
+            )
+        
+        return collection
+    
+    def get_hnsw_drift(self, collection=None) -> Dict[str, Any]:
+        """
+        Compare a collection's HNSW parameters against settings.
+        
+        Args:
+            collection: Chroma collection (defaults to the default tenant's)
+        
+        Returns:
+            Mapping of parameter name to the collection's differing value
+        """
+        collection = collection or self.get_collection()
+        current = collection.metadata or {}
+        drift = {}
+        for key, wanted in self.get_hnsw_metadata().items():
+            actual = current.get(key, CHROMA_HNSW_DEFAULTS[key])
+            if actual != wanted:
+                drift[key] = actual
+        return drift
+    
+    def rebuild_collection(self, tenant_id: Optional[str] = None, batch_size: int = 1000) -> int:
+        """
+        Rebuild a tenant's Chroma collection with the HNSW parameters from settings.
+        
+        Stored embeddings are copied into a new collection, so nothing is
+        re-embedded. Writes must be paused while this runs. If the process
+        dies after the old collection is dropped, the next open renames
+        the rebuilt copy into place.
+        
+        Args:
+            tenant_id: Tenant identifier
+            batch_size: Records copied per round trip
+        
+        Returns:
+            Number of chunks copied
+        """
+        if self.backend != "chroma":
+            raise ValueError("HNSW parameters only apply to the chroma backend")
+        if self.mode != "local":
+            raise ValueError("Rebuild the collection from a process in local mode")
+        
+        tenant_id = validate_tenant_id(tenant_id)
+        name = self.get_collection_name(tenant_id)
+        collection = self.get_collection(tenant_id)
+        
+        rebuild_name = f"{name}__rebuild"
+        try:
+            self.client.delete_collection(rebuild_name)
+        except ValueError:
+            pass
         
-        # Initialize LangChain Chroma wrapper
-        self.vectorstore = Chroma(
-            client=self.client,
-            collection_name=self.collection_name,
-            embedding_function=self.embeddings
+        rebuilt = self.client.create_collection(
+            name=rebuild_name,
+            metadata=self.get_hnsw_metadata(),
+            embedding_function=None
         )
+        
+        copied = 0
+        while True:
+            batch = collection.get(
+                limit=batch_size,
+                offset=copied,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            if not batch['ids']:
+                break
+            rebuilt.add(
+                ids=batch['ids'],
+                embeddings=batch['embeddings'],
+                documents=batch['documents'],
+                metadatas=batch['metadatas']
+            )
+            copied += len(batch['ids'])
+        
+        self.client.delete_collection(name)
+        rebuilt.modify(name=name)
+        
+        with self._collections_lock:
+            if tenant_id in self._collections:
+                self._collections[tenant_id] = {
+                    "collection": rebuilt,
+                    "last_used": self._collections[tenant_id]["last_used"]
+                }
+        
+        return copied
     
-    def add_documents(self, texts: List[str], metadata: List[Dict[str, Any]]) -> List[str]:
+    def list_tenants(self) -> List[str]:
+        """
+        List tenants that have a collection on disk.
+        
+        Returns:
+            Tenant IDs, including the default tenant
+        """
+        if self.mode != "local":
+            raise ValueError("Tenants can only be listed from a process in local mode")
+        
+        tenants = {settings.default_tenant_id}
+        if self.backend == "numpy":
+            tenants_dir = Path(settings.numpy_index_path) / "tenants"
+            if tenants_dir.exists():
+                tenants.update(p.name for p in tenants_dir.iterdir() if p.is_dir())
+        else:
+            for collection in self.client.list_collections():
+                name = collection.name
+                if name.startswith("tenant_") and not name.endswith(("__rebuild", DOCUMENT_INDEX_SUFFIX)):
+                    tenants.add(name[len("tenant_"):])
+        return sorted(tenants)
+    
+    def warm(self, tenant_id: Optional[str] = None) -> float:
+        """
+        Load a tenant's vector index into memory ahead of the first query.
+        
+        Args:
+            tenant_id: Tenant identifier
+        
+        Returns:
+            Seconds spent warming
+        """
+        started = time.perf_counter()
+        collection = self.get_collection(tenant_id)
+        
+        if self.mode == "client" or self.backend == "numpy":
+            collection.warm()
+        else:
+            sample = collection.get(limit=1, include=["embeddings"])
+            if sample['ids']:
+                # The first query loads the persisted HNSW index from disk
+                collection.query(
+                    query_embeddings=[sample['embeddings'][0]],
+                    n_results=1,
+                    include=[]
+                )
+        
+        return time.perf_counter() - started
+    
+    def add_documents(self, texts: List[str], metadata: List[Dict[str, Any]],
+                      tenant_id: Optional[str] = None) -> List[str]:
         """
         Add documents to the vector store.
         
         Args:
             texts: List of text chunks
             metadata: List of metadata dicts for each chunk
+            tenant_id: Tenant that owns the documents
         
         Returns:
             List of document IDs
         """
+        collection = self.get_collection(tenant_id)
+        
         # Generate unique IDs for each chunk
         ids = [str(uuid.uuid4()) for _ in texts]
         
-        # Add documents to vectorstore
-        self.vectorstore.add_texts(
-            texts=texts,
-            metadatas=metadata,
-            ids=ids
+        # Embed and add documents to the collection
+        embeddings = self.embeddings.embed_documents(texts)
+        collection.add(
+            ids=ids,
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=metadata
         )
         
+        # One centroid per document for two-stage retrieval
+        sums: Dict[str, np.ndarray] = {}
+        info: Dict[str, Dict[str, Any]] = {}
+        for embedding, chunk_metadata in zip(embeddings, metadata):
+            document_id = chunk_metadata.get("document_id")
+            if document_id is None:
+                continue
+            vector = np.asarray(embedding, dtype=np.float32)
+            sums[document_id] = sums[document_id] + vector if document_id in sums else vector
+            info.setdefault(document_id, {
+                "document_id": document_id,
+                "filename": chunk_metadata.get("filename", "Unknown"),
+                "chunk_count": 0
+            })["chunk_count"] += 1
+        if sums:
+            self._add_document_vectors(sums, info, tenant_id)
+        
         return ids
     
-    def similarity_search(self, query: str, k: int = None) -> List[Dict[str, Any]]:
+    def _add_document_vectors(self, sums: Dict[str, np.ndarray], info: Dict[str, Dict[str, Any]],
+                              tenant_id: Optional[str] = None):
+        """Store normalized centroids in the document index, replacing existing ones"""
+        document_index = self.get_document_index(tenant_id)
+        document_ids = list(sums)
+        centroids = np.stack([sums[d] for d in document_ids])
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        
+        self._delete_document_vectors(document_ids, tenant_id)
+        document_index.add(
+            ids=document_ids,
+            embeddings=centroids.tolist(),
+            metadatas=[info[d] for d in document_ids]
+        )
+    
+    def _delete_document_vectors(self, document_ids: List[str], tenant_id: Optional[str] = None):
+        """Remove documents from the document index (missing ones are skipped quietly)"""
+        document_index = self.get_document_index(tenant_id)
+        existing = document_index.get(ids=document_ids, include=[])['ids']
+        if existing:
+            document_index.delete(ids=existing)
+    
+    def build_document_index(self, tenant_id: Optional[str] = None, batch_size: int = 1000) -> int:
+        """
+        (Re)build a tenant's document index from stored chunk embeddings.
+        
+        Needed for collections created before document vectors existed.
+        Nothing is re-embedded; memory grows with the number of documents,
+        not chunks.
+        
+        Args:
+            tenant_id: Tenant identifier
+            batch_size: Chunks read per round trip
+        
+        Returns:
+            Number of documents indexed
+        """
+        collection = self.get_collection(tenant_id)
+        sums: Dict[str, np.ndarray] = {}
+        info: Dict[str, Dict[str, Any]] = {}
+        
+        for batch in self._iter_batches(collection, include=["embeddings", "metadatas"],
+                                        batch_size=batch_size):
+            vectors = np.asarray(batch['embeddings'], dtype=np.float32)
+            for vector, chunk_metadata in zip(vectors, batch['metadatas']):
+                document_id = chunk_metadata.get("document_id")
+                if document_id is None:
+                    continue
+                if document_id in sums:
+                    sums[document_id] += vector
+                else:
+                    sums[document_id] = vector.copy()
+                info.setdefault(document_id, {
+                    "document_id": document_id,
+                    "filename": chunk_metadata.get("filename", "Unknown"),
+                    "chunk_count": 0
+                })["chunk_count"] += 1
+        
+        # Drop vectors of documents that no longer have chunks
+        stale = [d for d in self.get_indexed_document_ids(tenant_id) if d not in sums]
+        if stale:
+            self._delete_document_vectors(stale, tenant_id)
+        
+        document_ids = list(sums)
+        for start in range(0, len(document_ids), batch_size):
+            batch_ids = document_ids[start:start + batch_size]
+            self._add_document_vectors({d: sums[d] for d in batch_ids}, info, tenant_id)
+        
+        return len(document_ids)
+    
+    def get_indexed_document_ids(self, tenant_id: Optional[str] = None) -> List[str]:
+        """
+        List documents that have a vector in the document index.
+        
+        Args:
+            tenant_id: Tenant identifier
+        
+        Returns:
+            Document IDs
+        """
+        document_index = self.get_document_index(tenant_id)
+        document_ids = []
+        for batch in self._iter_batches(document_index):
+            document_ids.extend(batch['ids'])
+        return document_ids
+    
+    def select_documents(self, query_embedding: List[float], n_documents: int,
+                         tenant_id: Optional[str] = None) -> List[str]:
+        """
+        First stage of two-stage retrieval: the documents closest to a query.
+        
+        Args:
+            query_embedding: Embedded query
+            n_documents: Documents to select
+            tenant_id: Tenant identifier
+        
+        Returns:
+            Document IDs, most similar first (empty if the index is empty)
+        """
+        document_index = self.get_document_index(tenant_id)
+        available = document_index.count()
+        if available == 0:
+            return []
+        
+        results = document_index.query(
+            query_embeddings=[query_embedding],
+            n_results=min(n_documents, available),
+            include=[]
+        )
+        return results['ids'][0]
+    
+    def similarity_search(self, query: str, k: int = None,
+                          tenant_id: Optional[str] = None,
+                          mmr_lambda: Optional[float] = None,
+                          fetch_k: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Perform similarity search for relevant documents.
         
+        With ``mmr_lambda`` below 1, ``fetch_k`` nearest chunks are fetched
+        with their embeddings and ``k`` of them are chosen by maximal
+        marginal relevance, so near-duplicate chunks don't crowd each other.
+        
         Args:
             query: Search query
             k: Number of results to return
+            tenant_id: Tenant whose documents are searched
+            mmr_lambda: Relevance vs. diversity (defaults to ``mmr_lambda`` setting)
+            fetch_k: MMR candidates (defaults to ``mmr_fetch_k`` setting)
         
         Returns:
-            List of documents with metadata and scores
+            List of documents with metadata, distance ("score") and
+            relevance ("relevance_score"), most relevant first (in MMR
+            selection order when diversifying)
         """
         if k is None:
             k = settings.top_k_results
+        if mmr_lambda is None:
+            mmr_lambda = settings.mmr_lambda
+        if fetch_k is None:
+            fetch_k = settings.mmr_fetch_k
+        fetch_k = min(fetch_k, settings.mmr_max_fetch_k)
+        diversify = mmr_lambda < 1 and k > 1 and fetch_k > k
+        
+        collection = self.get_collection(tenant_id)
+        if collection.count() == 0:
+            return []
+        space = self.get_distance_space(tenant_id)
         
         # Perform similarity search with scores
-        results = self.vectorstore.similarity_search_with_score(query, k=k)
+        query_embedding = self.embeddings.embed_query(query)
+        
+        # Two-stage retrieval: only search chunks of the closest documents
+        where = None
+        if settings.hierarchical_retrieval and collection.count() >= settings.hierarchical_min_chunks:
+            document_ids = self.select_documents(
+                query_embedding, settings.hierarchical_top_documents, tenant_id=tenant_id
+            )
+            if document_ids:
+                where = {"document_id": {"$in": document_ids}}
+        
+        include = ["metadatas", "documents", "distances"]
+        if diversify:
+            # The candidates' stored vectors feed MMR; nothing is re-embedded
+            include.append("embeddings")
+        
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=fetch_k if diversify else k,
+            where=where,
+            include=include
+        )
+        
+        order = range(len(results['ids'][0]))
+        if diversify:
+            order = mmr_select(query_embedding, results['embeddings'][0], k, mmr_lambda)
         
         # Format results
         formatted_results = []
-        for doc, score in results:
+        for i in order:
+            content = results['documents'][0][i]
+            metadata = results['metadatas'][0][i]
+            score = results['distances'][0][i]
             formatted_results.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "score": float(score)
+                "content": content,
+                "metadata": metadata,
+                "score": float(score),
+                "relevance_score": distance_to_relevance(float(score), space)
             })
         
         return formatted_results
     
-    def delete_by_document_id(self, document_id: str) -> int:
+    def count_document_chunks(self, document_ids: List[str], tenant_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Count the chunks each document has right now.
+        
+        One ID-only query per document, so the counts are not affected by
+        deletes or compactions shifting the offsets of a paged scan.
+        
+        Args:
+            document_ids: Document identifiers
+            tenant_id: Tenant that owns the documents
+        
+        Returns:
+            Chunk count per document ID
+        """
+        collection = self.get_collection(tenant_id)
+        return {
+            document_id: len(collection.get(where={"document_id": document_id}, include=[])['ids'])
+            for document_id in document_ids
+        }
+    
+    def delete_by_document_id(self, document_id: str, tenant_id: Optional[str] = None) -> int:
         """
         Delete all chunks associated with a document.
         
         Args:
             document_id: Document identifier
+            tenant_id: Tenant that owns the document
         
         Returns:
             Number of chunks deleted
         """
-        collection = self.client.get_collection(self.collection_name)
+        deleted = self.delete_where({"document_id": document_id}, tenant_id=tenant_id)
         
-        # Get all documents with this document_id
-        results = collection.get(
-            where={"document_id": document_id}
-        )
+        # Chunks go first: a crash in between only leaves a harmless stale vector
+        self._delete_document_vectors([document_id], tenant_id)
+        return deleted
+    
+    def delete_by_document_ids(self, document_ids: List[str], tenant_id: Optional[str] = None) -> int:
+        """
+        Delete all chunks of several documents.
+        
+        Args:
+            document_ids: Document identifiers
+            tenant_id: Tenant that owns the documents
+        
+        Returns:
+            Number of chunks deleted
+        """
+        deleted = 0
+        # Keep each $in filter small enough for one SQL statement
+        for start in range(0, len(document_ids), 500):
+            batch = document_ids[start:start + 500]
+            deleted += self.delete_where({"document_id": {"$in": batch}}, tenant_id=tenant_id)
+            self._delete_document_vectors(batch, tenant_id)
+        return deleted
+    
+    def delete_where(self, where: Dict[str, Any], tenant_id: Optional[str] = None,
+                     batch_size: Optional[int] = None) -> int:
+        """
+        Delete chunks matching a metadata filter in batches.
+        
+        Only IDs are fetched, ``delete_batch_size`` at a time, so large
+        deletes never pull documents or metadata into memory.
+        
+        Args:
+            where: Chroma metadata filter
+            tenant_id: Tenant that owns the chunks
+            batch_size: Chunk IDs per round trip
+        
+        Returns:
+            Number of chunks deleted
+        """
+        batch_size = batch_size or settings.delete_batch_size
+        collection = self.get_collection(tenant_id)
         
-        if results and results['ids']:
-            # Delete all matching chunks
-            collection.delete(ids=results['ids'])
-            return len(results['ids'])
+        deleted = 0
+        while True:
+            batch = collection.get(where=where, limit=batch_size, include=[])
+            if not batch['ids']:
+                break
+            collection.delete(ids=batch['ids'])
+            deleted += len(batch['ids'])
         
-        return 0
+        return deleted
     
-    def get_all_document_ids(self) -> List[str]:
+    def find_documents(self, where: Optional[Dict[str, Any]] = None,
+                       tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get one metadata record per document, optionally filtered.
+        
+        Only each document's first chunk is read.
+        
+        Args:
+            where: Extra Chroma metadata filter
+            tenant_id: Tenant whose documents are searched
+        
+        Returns:
+            Metadata of each matching document's first chunk
+        """
+        collection = self.get_collection(tenant_id)
+        first_chunk = {"chunk_index": 0}
+        where = {"$and": [first_chunk, where]} if where else first_chunk
+        
+        documents = []
+        for batch in self._iter_batches(collection, where=where, include=["metadatas"]):
+            documents.extend(batch['metadatas'])
+        return documents
+    
+    def iter_chunk_metadata(self, tenant_id: Optional[str] = None, batch_size: Optional[int] = None):
+        """
+        Iterate over the metadata of every chunk, one page at a time.
+        
+        Args:
+            tenant_id: Tenant whose chunks are read
+            batch_size: Chunks per page
+        
+        Yields:
+            Lists of chunk metadata dicts
+        """
+        collection = self.get_collection(tenant_id)
+        for batch in self._iter_batches(collection, include=["metadatas"], batch_size=batch_size):
+            yield batch['metadatas']
+    
+    def iter_chunks(self, tenant_id: Optional[str] = None, include: Optional[List[str]] = None,
+                    batch_size: Optional[int] = None):
+        """
+        Iterate over every chunk, one page at a time.
+        
+        Args:
+            tenant_id: Tenant whose chunks are read
+            include: Fields to return besides ids
+            batch_size: Chunks per page
+        
+        Yields:
+            Chroma-shaped ``get`` results
+        """
+        collection = self.get_collection(tenant_id)
+        yield from self._iter_batches(collection, include=include, batch_size=batch_size)
+    
+    def _iter_batches(self, collection, where: Optional[Dict[str, Any]] = None,
+                      include: Optional[List[str]] = None, batch_size: Optional[int] = None):
+        """Page through ``collection.get`` results"""
+        batch_size = batch_size or settings.delete_batch_size
+        offset = 0
+        while True:
+            batch = collection.get(where=where, limit=batch_size, offset=offset, include=include or [])
+            if not batch['ids']:
+                break
+            yield batch
+            offset += len(batch['ids'])
+    
+    def get_all_document_ids(self, tenant_id: Optional[str] = None) -> List[str]:
         """
         Get all unique document IDs in the vector store.
         
+        Args:
+            tenant_id: Tenant whose documents are listed
+        
         Returns:
             List of document IDs
         """
-        collection = self.client.get_collection(self.collection_name)
+        collection = self.get_collection(tenant_id)
         
         # Get all metadata
-        all_data = collection.get()
+        all_data = collection.get(include=["metadatas"])
         
         if not all_data or not all_data['metadatas']:
             return []
@@ -140,21 +994,23 @@ class VectorStoreService:
         
         return list(document_ids)
     
-    def get_document_metadata(self, document_id: str) -> Dict[str, Any]:
+    def get_document_metadata(self, document_id: str, tenant_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Get metadata for a specific document.
         
         Args:
             document_id: Document identifier
+            tenant_id: Tenant that owns the document
         
         Returns:
             Document metadata
         """
-        collection = self.client.get_collection(self.collection_name)
+        collection = self.get_collection(tenant_id)
         
         results = collection.get(
             where={"document_id": document_id},
-            limit=1
+            limit=1,
+            include=["metadatas"]
         )
         
         if results and results['metadatas']:
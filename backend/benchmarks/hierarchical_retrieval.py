@@ -0,0 +1,164 @@
+"""
+Latency and recall of two-stage (document-first) retrieval against flat search.
+
+The synthetic corpus has document structure: chunks are scattered around
+their document's centre, and documents around a topic centre. Document
+vectors are the normalised centroids of their chunks, as stored at upload.
+Recall is measured against exact brute-force top-k over all chunks.
+
+Usage (from the backend directory):
+    python -m benchmarks.hierarchical_retrieval --chunks 100000 --dim 384
+    python -m benchmarks.hierarchical_retrieval --backends numpy --top-documents 10 20 50
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.vector_backends import open_backend
+
+N_TOPICS = 64
+BATCH_SIZE = 5000
+
+def document_centres(n_documents: int, dim: int, seed: int, spread: float) -> np.ndarray:
+    """One centre per document, grouped around shared topics"""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((N_TOPICS, dim)).astype(np.float32)
+    topics /= np.linalg.norm(topics, axis=1, keepdims=True)
+    centres = topics[rng.integers(0, N_TOPICS, n_documents)]
+    centres = centres + spread * rng.standard_normal((n_documents, dim)).astype(np.float32) / np.sqrt(dim)
+    return centres / np.linalg.norm(centres, axis=1, keepdims=True)
+
+def generate_chunks(n_chunks: int, chunks_per_document: int, centres: np.ndarray, seed: int,
+                    noise: float = 1.0):
+    """Yield (start, vectors, document indices) batches of normalised chunk vectors"""
+    dim = centres.shape[1]
+    for start in range(0, n_chunks, BATCH_SIZE):
+        rng = np.random.default_rng(seed + 1 + start)
+        count = min(BATCH_SIZE, n_chunks - start)
+        documents = np.arange(start, start + count) // chunks_per_document
+        vectors = centres[documents] + noise * rng.standard_normal((count, dim)).astype(np.float32) / np.sqrt(dim)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        yield start, vectors, documents
+
+def exact_top_k(queries: np.ndarray, args, centres: np.ndarray):
+    """Ground-truth chunk ids by streaming brute force"""
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+    for start, vectors, _ in generate_chunks(args.chunks, args.chunks_per_document, centres, args.seed,
+                                             args.chunk_noise):
+        scores = queries @ vectors.T
+        ids = np.broadcast_to(np.arange(start, start + len(vectors)), scores.shape)
+        scores = np.concatenate([best_scores, scores], axis=1)
+        ids = np.concatenate([best_ids, ids], axis=1)
+        keep = np.argsort(-scores, axis=1)[:, :args.k]
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_ids = np.take_along_axis(ids, keep, axis=1)
+    return [set(f"c{i}" for i in row) for row in best_ids]
+
+def build(backend: str, path: str, args, centres: np.ndarray):
+    """Load chunks and document centroids into two stores of the given backend"""
+    chunks = open_backend(backend, f"{path}/chunks", args.ivf_min_vectors, args.nprobe)
+    documents = open_backend(backend, f"{path}/documents", args.ivf_min_vectors, args.nprobe)
+    sums = np.zeros_like(centres)
+    
+    for start, vectors, owners in generate_chunks(args.chunks, args.chunks_per_document, centres, args.seed,
+                                                  args.chunk_noise):
+        chunks.add(
+            ids=[f"c{i}" for i in range(start, start + len(vectors))],
+            embeddings=vectors.tolist(),
+            metadatas=[{"document_id": f"d{d}"} for d in owners],
+        )
+        np.add.at(sums, owners, vectors)
+    
+    centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    for start in range(0, len(centroids), BATCH_SIZE):
+        block = centroids[start:start + BATCH_SIZE]
+        documents.add(
+            ids=[f"d{d}" for d in range(start, start + len(block))],
+            embeddings=block.tolist(),
+            metadatas=[{"document_id": f"d{d}"} for d in range(start, start + len(block))],
+        )
+    
+    for store in (chunks, documents):
+        if hasattr(store, "wait_for_maintenance"):
+            store.wait_for_maintenance()
+    return chunks, documents
+
+def measure(search, queries: np.ndarray, truth, k: int) -> dict:
+    """Run every query through ``search`` and summarise latency and recall"""
+    latencies = []
+    recalls = []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        found = search(query.tolist())
+        latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(len(set(found) & expected) / k)
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "recall": float(np.mean(recalls)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--chunks-per-document", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--top-documents", type=int, nargs="+", default=[5, 10, 20, 50])
+    parser.add_argument("--backends", nargs="+", default=["chroma", "numpy-float32"],
+                        choices=["chroma", "numpy-float32", "numpy-float16", "numpy-int8"])
+    parser.add_argument("--ivf-min-vectors", type=int, default=50000)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--document-spread", type=float, default=0.2, help="Spread of documents around their topic")
+    parser.add_argument("--chunk-noise", type=float, default=1.0, help="Spread of chunks around their document")
+    parser.add_argument("--query-noise", type=float, default=2.0, help="Spread of queries around their document")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    n_documents = -(-args.chunks // args.chunks_per_document)
+    centres = document_centres(n_documents, args.dim, args.seed, args.document_spread)
+    
+    # Queries sit near chunks of random documents, like questions about a passage
+    _, queries, _ = next(generate_chunks(args.queries, 1, centres[
+        np.random.default_rng(args.seed + 7919).integers(0, n_documents, args.queries)
+    ], args.seed + 7919, args.query_noise))
+    truth = exact_top_k(queries, args, centres)
+    
+    print(f"{args.chunks} chunks in {n_documents} documents x {args.dim} dims, "
+          f"{args.queries} queries, k={args.k}")
+    header = f"{'backend':<15}{'search':<14}{'p50 ms':>9}{'p95 ms':>9}{'recall':>8}"
+    print(header)
+    print("-" * len(header))
+    
+    for backend in args.backends:
+        with tempfile.TemporaryDirectory() as path:
+            chunks, documents = build(backend, path, args, centres)
+            
+            def flat(query):
+                return chunks.query(query_embeddings=[query], n_results=args.k, include=[])["ids"][0]
+            
+            row = measure(flat, queries, truth, args.k)
+            print(f"{backend:<15}{'flat':<14}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['recall']:>8.3f}")
+            
+            for top_documents in args.top_documents:
+                def two_stage(query):
+                    selected = documents.query(
+                        query_embeddings=[query], n_results=top_documents, include=[]
+                    )["ids"][0]
+                    return chunks.query(
+                        query_embeddings=[query],
+                        n_results=args.k,
+                        where={"document_id": {"$in": selected}},
+                        include=[],
+                    )["ids"][0]
+                
+                row = measure(two_stage, queries, truth, args.k)
+                label = f"top-{top_documents} docs"
+                print(f"{backend:<15}{label:<14}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['recall']:>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Sweep Chroma's HNSW ``search_ef`` against recall and query latency.
+
+Recall is measured against exact brute-force neighbours. By default the
+corpus is synthetic; ``--from-store`` samples embeddings from the configured
+vector store so the sweep reflects the real corpus. Queries are held out of
+the indexed set.
+
+Usage (from the backend directory):
+    python -m benchmarks.hnsw_ef_sweep --ef 10 32 64 128 256
+    python -m benchmarks.hnsw_ef_sweep --from-store --max-vectors 50000
+"""
+import argparse
+import time
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings as ChromaSettings
+
+from benchmarks.vector_backends import generate_batches
+
+def load_store_embeddings(max_vectors: int) -> np.ndarray:
+    """Read up to ``max_vectors`` embeddings from the configured Chroma collection"""
+    from app.services.vector_store import vector_store_service
+    
+    batches = []
+    offset = 0
+    while offset < max_vectors:
+        batch = vector_store_service.get_collection().get(
+            limit=min(5000, max_vectors - offset),
+            offset=offset,
+            include=["embeddings"]
+        )
+        if not batch["ids"]:
+            break
+        batches.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        offset += len(batch["ids"])
+    return np.concatenate(batches)
+
+def exact_neighbours(corpus: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Row indices of the true top-k neighbours for the given space"""
+    if space == "l2":
+        scores = -(np.sum(corpus ** 2, axis=1)[None, :] - 2 * queries @ corpus.T)
+    elif space == "cosine":
+        normed = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normed.T
+    else:
+        scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep HNSW search_ef against recall and latency")
+    parser.add_argument("--ef", type=int, nargs="+", default=[10, 16, 32, 64, 128, 256])
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], default="cosine")
+    parser.add_argument("--construction-ef", type=int, default=200)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--from-store", action="store_true")
+    parser.add_argument("--max-vectors", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    if args.from_store:
+        data = load_store_embeddings(args.max_vectors)
+    else:
+        data = np.concatenate([v for _, v in generate_batches(args.vectors, args.dim, args.seed)])
+    
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(data))
+    n_queries = min(args.queries, len(data) // 10)
+    queries = data[order[:n_queries]]
+    corpus = data[order[n_queries:]]
+    truth = exact_neighbours(corpus, queries, args.k, args.space)
+    ids = [str(i) for i in range(len(corpus))]
+    
+    print(f"{len(corpus)} vectors x {corpus.shape[1]} dims, {n_queries} queries, k={args.k}, "
+          f"space={args.space}, construction_ef={args.construction_ef}, M={args.m}")
+    header = f"{'search_ef':>10}{'recall':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    
+    client = chromadb.EphemeralClient(ChromaSettings(anonymized_telemetry=False, allow_reset=True))
+    for ef in args.ef:
+        # search_ef is baked into the HNSW segment at creation, so build one index per value
+        name = f"ef_sweep_{ef}"
+        collection = client.create_collection(
+            name=name,
+            metadata={
+                "hnsw:space": args.space,
+                "hnsw:construction_ef": args.construction_ef,
+                "hnsw:search_ef": ef,
+                "hnsw:M": args.m
+            },
+            embedding_function=None
+        )
+        for start in range(0, len(corpus), 5000):
+            collection.add(ids=ids[start:start + 5000], embeddings=corpus[start:start + 5000].tolist())
+        
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            result = collection.query(query_embeddings=[query.tolist()], n_results=args.k, include=[])
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(set(int(i) for i in result["ids"][0]) & set(expected.tolist()))
+        client.delete_collection(name)
+        
+        print(f"{ef:>10}{hits / (n_queries * args.k):>9.3f}{np.percentile(latencies, 50):>9.2f}"
+              f"{np.percentile(latencies, 95):>9.2f}{np.percentile(latencies, 99):>9.2f}")
+
+if __name__ == "__main__":
+    main()
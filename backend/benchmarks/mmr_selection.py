@@ -0,0 +1,106 @@
+"""
+Selection time of vectorized MMR against a per-pair Python loop.
+
+Candidates come in groups of near-duplicates, like overlapping chunks of
+a repetitive document, sorted by similarity to the query as the store
+returns them. Besides timing, the table shows how many distinct groups
+the k selected chunks cover, compared with plain top-k.
+
+Usage (from the backend directory):
+    python -m benchmarks.mmr_selection --fetch-k 20 50 100 200 500 --dim 1536
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.mmr import mmr_select
+
+def generate_candidates(fetch_k: int, dim: int, group_size: int, rng: np.random.Generator):
+    """A query and fetch_k candidates in groups of near-duplicates, most similar first"""
+    query = rng.standard_normal(dim).astype(np.float32)
+    n_groups = -(-fetch_k // group_size)
+    centres = query + 1.5 * rng.standard_normal((n_groups, dim)).astype(np.float32)
+    groups = np.arange(fetch_k) // group_size
+    candidates = centres[groups] + 0.2 * rng.standard_normal((fetch_k, dim)).astype(np.float32)
+    candidates /= np.linalg.norm(candidates, axis=1, keepdims=True)
+    
+    order = np.argsort(-(candidates @ query))
+    return query, candidates[order], groups[order]
+
+def mmr_loop(query, candidates, k: int, lambda_mult: float):
+    """Reference MMR computing every candidate/selected similarity in Python"""
+    def cosine(a, b):
+        return sum(x * y for x, y in zip(a, b)) / (
+            sum(x * x for x in a) ** 0.5 * sum(y * y for y in b) ** 0.5
+        )
+    
+    query = query.tolist()
+    candidates = candidates.tolist()
+    relevance = [cosine(query, c) for c in candidates]
+    selected = [max(range(len(candidates)), key=relevance.__getitem__)]
+    while len(selected) < min(k, len(candidates)):
+        best, best_score = None, -np.inf
+        for i, candidate in enumerate(candidates):
+            if i in selected:
+                continue
+            redundancy = max(cosine(candidate, candidates[j]) for j in selected)
+            score = lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+    return selected
+
+def time_ms(function, repeats: int) -> np.ndarray:
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.array(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[20, 50, 100, 200, 500])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    parser.add_argument("--group-size", type=int, default=4, help="Near-duplicate chunks per group")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--loop-queries", type=int, default=3, help="Queries timed with the Python loop")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    print(f"k={args.k}, lambda={args.lambda_mult}, {args.dim} dims, "
+          f"groups of {args.group_size} near-duplicates")
+    header = f"{'fetch_k':>8}{'numpy p50':>11}{'numpy p95':>11}{'loop p50':>11}" \
+             f"{'speedup':>9}{'groups top-k':>14}{'groups MMR':>12}"
+    print(header)
+    print("-" * len(header))
+    
+    for fetch_k in args.fetch_k:
+        rng = np.random.default_rng(args.seed + fetch_k)
+        cases = [generate_candidates(fetch_k, args.dim, args.group_size, rng) for _ in range(args.queries)]
+        
+        numpy_ms = np.concatenate([
+            time_ms(lambda: mmr_select(query, candidates, args.k, args.lambda_mult), 5)
+            for query, candidates, _ in cases
+        ])
+        loop_ms = np.concatenate([
+            time_ms(lambda: mmr_loop(query, candidates, args.k, args.lambda_mult), 1)
+            for query, candidates, _ in cases[:args.loop_queries]
+        ])
+        
+        groups_top_k = np.mean([len(set(groups[:args.k])) for _, _, groups in cases])
+        groups_mmr = np.mean([
+            len(set(groups[mmr_select(query, candidates, args.k, args.lambda_mult)]))
+            for query, candidates, groups in cases
+        ])
+        
+        numpy_p50 = np.percentile(numpy_ms, 50)
+        loop_p50 = np.percentile(loop_ms, 50)
+        print(f"{fetch_k:>8}{numpy_p50:>11.3f}{np.percentile(numpy_ms, 95):>11.3f}{loop_p50:>11.1f}"
+              f"{loop_p50 / numpy_p50:>8.0f}x{groups_top_k:>14.2f}{groups_mmr:>12.2f}")
+
+if __name__ == "__main__":
+    main()
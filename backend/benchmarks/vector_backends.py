@@ -0,0 +1,176 @@
+"""
+Memory and latency comparison of the Chroma and NumPy vector backends.
+
+Each backend runs in its own subprocess so resident memory is measured in
+isolation. Vectors are synthetic, clustered and generated in batches, so
+the harness itself never holds the whole corpus in memory.
+
+Usage (from the backend directory):
+    python -m benchmarks.vector_backends --vectors 50000 --dim 1536
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKENDS = ["chroma", "numpy-float32", "numpy-float16", "numpy-int8"]
+BATCH_SIZE = 5000
+N_CLUSTERS = 64
+
+def rss_mb() -> float:
+    """Current resident set size in MB"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak RSS is the best available fallback (KB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def generate_batches(n_vectors: int, dim: int, seed: int):
+    """Yield (start, vectors) batches of clustered, normalised vectors"""
+    centers = np.random.default_rng(seed).standard_normal((N_CLUSTERS, dim)).astype(np.float32)
+    for start in range(0, n_vectors, BATCH_SIZE):
+        rng = np.random.default_rng(seed + 1 + start)
+        count = min(BATCH_SIZE, n_vectors - start)
+        labels = rng.integers(0, N_CLUSTERS, count)
+        vectors = centers[labels] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        yield start, vectors
+
+def generate_queries(n_queries: int, dim: int, seed: int) -> np.ndarray:
+    """Queries drawn from the same distribution as the corpus"""
+    _, queries = next(generate_batches(n_queries, dim, seed + 7919))
+    return queries
+
+def exact_top_k(queries: np.ndarray, n_vectors: int, dim: int, seed: int, k: int):
+    """Ground-truth neighbour ids by streaming brute force"""
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+    for start, vectors in generate_batches(n_vectors, dim, seed):
+        scores = queries @ vectors.T
+        ids = np.broadcast_to(np.arange(start, start + len(vectors)), scores.shape)
+        scores = np.concatenate([best_scores, scores], axis=1)
+        ids = np.concatenate([best_ids, ids], axis=1)
+        keep = np.argsort(-scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_ids = np.take_along_axis(ids, keep, axis=1)
+    return [set(f"v{i}" for i in row) for row in best_ids]
+
+def open_backend(backend: str, path: str, ivf_min_vectors: int, nprobe: int):
+    """Create an empty collection-compatible store for a backend name"""
+    if backend == "chroma":
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+        
+        client = chromadb.PersistentClient(
+            path=path, settings=ChromaSettings(anonymized_telemetry=False)
+        )
+        return client.get_or_create_collection(
+            name="benchmark",
+            metadata={"hnsw:space": "cosine", "hnsw:construction_ef": 200, "hnsw:search_ef": 64},
+            embedding_function=None
+        )
+    
+    from app.services.numpy_index import NumpyVectorIndex
+    
+    return NumpyVectorIndex(
+        path=path,
+        quantization=backend.split("-", 1)[1],
+        ivf_min_vectors=ivf_min_vectors,
+        ivf_nprobe=nprobe,
+    )
+
+def run_worker(args) -> dict:
+    """Build one backend, then measure memory, latency and recall"""
+    queries = generate_queries(args.queries, args.dim, args.seed)
+    
+    with tempfile.TemporaryDirectory() as path:
+        rss_start = rss_mb()
+        store = open_backend(args.backend, path, args.ivf_min_vectors, args.nprobe)
+        
+        build_start = time.perf_counter()
+        for start, vectors in generate_batches(args.vectors, args.dim, args.seed):
+            ids = [f"v{i}" for i in range(start, start + len(vectors))]
+            store.add(
+                ids=ids,
+                embeddings=vectors.tolist(),
+                metadatas=[{"document_id": f"d{i // 50}"} for i in range(start, start + len(vectors))],
+            )
+        if hasattr(store, "wait_for_maintenance"):
+            store.wait_for_maintenance()
+        build_seconds = time.perf_counter() - build_start
+        rss_built = rss_mb()
+        
+        latencies = []
+        found = []
+        for query in queries:
+            started = time.perf_counter()
+            result = store.query(
+                query_embeddings=[query.tolist()], n_results=args.k, include=["distances"]
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            found.append(set(result["ids"][0]))
+        rss_queried = rss_mb()
+    
+    truth = exact_top_k(queries, args.vectors, args.dim, args.seed, args.k)
+    recall = np.mean([len(f & t) / args.k for f, t in zip(found, truth)])
+    
+    return {
+        "backend": args.backend,
+        "build_s": build_seconds,
+        "rss_build_mb": rss_built - rss_start,
+        "rss_query_mb": rss_queried - rss_start,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "recall": float(recall),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ivf-min-vectors", type=int, default=50000)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.backend:
+        print(json.dumps(run_worker(args)))
+        return
+    
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.k}")
+    header = f"{'backend':<15}{'build s':>9}{'RSS build':>11}{'RSS query':>11}" \
+             f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'recall':>8}"
+    print(header)
+    print("-" * len(header))
+    
+    for backend in args.backends:
+        command = [sys.executable, "-m", "benchmarks.vector_backends", "--backend", backend]
+        for option in ("vectors", "dim", "queries", "k", "seed", "ivf_min_vectors", "nprobe"):
+            command += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+        output = subprocess.run(
+            command, capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout
+        row = json.loads(output.strip().splitlines()[-1])
+        print(f"{row['backend']:<15}{row['build_s']:>9.1f}{row['rss_build_mb']:>10.0f}M"
+              f"{row['rss_query_mb']:>10.0f}M{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+              f"{row['p99_ms']:>9.2f}{row['recall']:>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Build the document-level index used by two-stage retrieval.
+
+New uploads are indexed automatically; run this once for documents
+uploaded before document vectors existed. Chunk embeddings are read back
+from the store, so nothing is re-embedded.
+
+Usage (from the backend directory):
+    python -m scripts.build_document_index
+    python -m scripts.build_document_index --tenant acme
+    python -m scripts.build_document_index --all-tenants
+"""
+import argparse
+import time
+from app.services.vector_store import vector_store_service
+
+def main():
+    parser = argparse.ArgumentParser(description="Build document-level vectors from stored chunk embeddings")
+    parser.add_argument("--tenant", help="Tenant to index (defaults to the default tenant)")
+    parser.add_argument("--all-tenants", action="store_true", help="Index every tenant's documents")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    
+    tenants = vector_store_service.list_tenants() if args.all_tenants else [args.tenant]
+    
+    for tenant_id in tenants:
+        name = vector_store_service.get_collection_name(tenant_id)
+        started = time.perf_counter()
+        indexed = vector_store_service.build_document_index(tenant_id, batch_size=args.batch_size)
+        print(f"{name}: indexed {indexed} documents in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Calibrate RELEVANCE_THRESHOLD against labelled queries.
+
+The queries file is a JSON list of objects with a "query" and whether the
+knowledge base can answer it, e.g.:
+    [{"query": "What are the core hours?", "answerable": true},
+     {"query": "Who won the 1998 World Cup?", "answerable": false}]
+
+For each query the best chunk's relevance is recorded, then candidate
+thresholds are swept. The suggested threshold is the highest one that
+still lets at least --min-recall of the answerable queries through.
+
+Usage (from the backend directory):
+    python -m scripts.calibrate_relevance queries.json
+    python -m scripts.calibrate_relevance queries.json --tenant acme --min-recall 0.95
+"""
+import argparse
+import json
+import sys
+from app.config import settings
+from app.services.vector_store import vector_store_service
+
+def best_relevance(query: str, tenant_id: str) -> float:
+    """Relevance of the top chunk for a query (-1.0 if the store is empty)"""
+    results = vector_store_service.similarity_search(query, k=1, tenant_id=tenant_id)
+    return results[0]['relevance_score'] if results else -1.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the relevance gate threshold")
+    parser.add_argument("queries", help="JSON file of {query, answerable} objects")
+    parser.add_argument("--tenant", help="Tenant to search (defaults to the default tenant)")
+    parser.add_argument("--min-recall", type=float, default=0.98,
+                        help="Share of answerable queries that must pass the gate")
+    parser.add_argument("--step", type=float, default=0.01)
+    args = parser.parse_args()
+    
+    with open(args.queries, "r", encoding="utf-8") as f:
+        labelled = json.load(f)
+    
+    answerable = [best_relevance(q["query"], args.tenant) for q in labelled if q["answerable"]]
+    unanswerable = [best_relevance(q["query"], args.tenant) for q in labelled if not q["answerable"]]
+    if not answerable:
+        print("Need at least one answerable query")
+        sys.exit(1)
+    
+    print(f"{len(answerable)} answerable, {len(unanswerable)} unanswerable queries")
+    print(f"{'threshold':>10}{'answered':>10}{'refused':>10}")
+    
+    suggested = None
+    threshold = 0.0
+    while threshold <= 1.0:
+        passed = sum(score >= threshold for score in answerable) / len(answerable)
+        refused = (
+            sum(score < threshold for score in unanswerable) / len(unanswerable)
+            if unanswerable else 0.0
+        )
+        if passed >= args.min_recall:
+            suggested = threshold
+        if round(threshold / args.step) % 5 == 0:
+            print(f"{threshold:>10.2f}{passed:>10.1%}{refused:>10.1%}")
+        threshold = round(threshold + args.step, 6)
+    
+    print(f"\nCurrent RELEVANCE_THRESHOLD: {settings.relevance_threshold}")
+    if suggested is None:
+        print(f"No threshold keeps {args.min_recall:.0%} of answerable queries; leave the gate disabled (0)")
+    else:
+        print(f"Suggested RELEVANCE_THRESHOLD: {suggested:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Rebuild Chroma collections with the HNSW parameters from settings.
+
+Stop the API (or pause uploads) first: writes made during the copy are lost.
+
+Usage (from the backend directory):
+    python -m scripts.rebuild_vector_index
+    python -m scripts.rebuild_vector_index --tenant acme
+    python -m scripts.rebuild_vector_index --all-tenants --check
+"""
+import argparse
+import sys
+from app.services.vector_store import vector_store_service
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild Chroma collections with current HNSW settings")
+    parser.add_argument("--tenant", help="Tenant to rebuild (defaults to the default tenant)")
+    parser.add_argument("--all-tenants", action="store_true", help="Rebuild every tenant's collection")
+    parser.add_argument("--check", action="store_true", help="Only report parameter drift")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    
+    if vector_store_service.backend != "chroma":
+        print("HNSW parameters only apply to the chroma backend")
+        sys.exit(1)
+    
+    tenants = vector_store_service.list_tenants() if args.all_tenants else [args.tenant]
+    wanted = vector_store_service.get_hnsw_metadata()
+    drifted = False
+    
+    for tenant_id in tenants:
+        name = vector_store_service.get_collection_name(tenant_id)
+        drift = vector_store_service.get_hnsw_drift(vector_store_service.get_collection(tenant_id))
+        if not drift:
+            print(f"{name}: already matches the configured HNSW parameters")
+            continue
+        
+        drifted = True
+        for key, actual in drift.items():
+            print(f"{name}: {key}: {actual} -> {wanted[key]}")
+        
+        if not args.check:
+            copied = vector_store_service.rebuild_collection(tenant_id, batch_size=args.batch_size)
+            print(f"{name}: rebuilt with {copied} chunks")
+    
+    if args.check and drifted:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Export or import a knowledge base snapshot (chunks, metadata and embeddings).
+
+Importing loads stored embeddings directly, so a new replica or environment
+is bootstrapped without re-uploading files or calling the embedding API.
+The target collection must be empty.
+
+Usage (from the backend directory):
+    python -m scripts.snapshot export kb.kbsnap
+    python -m scripts.snapshot export kb.kbsnap --tenant acme --dtype float16
+    python -m scripts.snapshot verify kb.kbsnap
+    python -m scripts.snapshot import kb.kbsnap --tenant acme
+"""
+import argparse
+import json
+import sys
+import time
+from app.services.snapshot import SNAPSHOT_DTYPES, snapshot_service
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a knowledge base snapshot")
+    parser.add_argument("action", choices=["export", "import", "verify"])
+    parser.add_argument("path", help="Snapshot file")
+    parser.add_argument("--tenant", help="Tenant to export or import (defaults to the default tenant)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Chunks per segment when exporting")
+    parser.add_argument("--dtype", choices=list(SNAPSHOT_DTYPES), default="float32",
+                        help="Embedding precision when exporting")
+    args = parser.parse_args()
+    
+    started = time.perf_counter()
+    try:
+        if args.action == "export":
+            manifest = snapshot_service.export_to_file(
+                args.path, args.tenant, batch_size=args.batch_size, dtype=args.dtype
+            )
+        else:
+            with open(args.path, "rb") as f:
+                if args.action == "verify":
+                    manifest = snapshot_service.verify(f)
+                else:
+                    manifest = snapshot_service.import_from_file(f, args.tenant)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    
+    print(json.dumps(manifest, indent=2))
+    print(f"{args.action} of {manifest['chunks']} chunks took {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+Shared test setup.
+
+Settings are read from the environment when ``app.config`` is first
+imported, so point every path at a throwaway directory before any test
+module imports the application. No test calls OpenAI.
+"""
+import os
+import tempfile
+
+_data_dir = tempfile.mkdtemp(prefix="rag-tests-")
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("VECTOR_DB_PATH", os.path.join(_data_dir, "chroma"))
+os.environ.setdefault("NUMPY_INDEX_PATH", os.path.join(_data_dir, "numpy"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_data_dir, "uploads"))
+os.environ.setdefault("PROFILE_DIR", os.path.join(_data_dir, "profiles"))
@@ -0,0 +1,37 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+
+ADMIN_ROUTES = [
+    ("/api/documents/bulk-delete", {"uploaded_before": "2000-01-01T00:00:00"}),
+    ("/api/documents/gc", None),
+]
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.mark.parametrize("path,body", ADMIN_ROUTES)
+def test_destructive_routes_are_disabled_without_an_admin_token(client, monkeypatch, path, body):
+    monkeypatch.setattr(settings, "admin_token", "")
+    
+    assert client.post(path, json=body).status_code == 404
+
+@pytest.mark.parametrize("path,body", ADMIN_ROUTES)
+def test_destructive_routes_require_the_admin_token(client, monkeypatch, path, body):
+    monkeypatch.setattr(settings, "admin_token", "s3cret")
+    
+    assert client.post(path, json=body).status_code == 401
+    assert client.post(path, json=body, headers={"X-Admin-Token": "wrong"}).status_code == 401
+    assert client.post(path, json=body, headers={"X-Admin-Token": "s3cret"}).status_code == 200
+
+def test_pipeline_stats_require_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "s3cret")
+    
+    assert client.get("/api/chat/stats").status_code == 401
+    
+    stats = client.get("/api/chat/stats", headers={"X-Admin-Token": "s3cret"})
+    assert stats.status_code == 200
+    assert "base_url" in stats.json()["llm"]["endpoints"][0]
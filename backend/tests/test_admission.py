@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.config import settings
+from app.dependencies import client_address
+from app.services import admission
+from app.services.admission import AdmissionPool, AdmissionRejected, RateLimiter
+
+async def _hold(pool, name, order, release):
+    async with pool.slot():
+        order.append(name)
+        await release.wait()
+
+def test_queued_requests_start_in_arrival_order():
+    async def run():
+        pool = AdmissionPool("chat", concurrency=1, slo_seconds=0)
+        order = []
+        release = asyncio.Event()
+        tasks = []
+        for name in ("first", "second", "third", "fourth"):
+            tasks.append(asyncio.create_task(_hold(pool, name, order, release)))
+            await asyncio.sleep(0)
+        
+        assert order == ["first"]
+        assert pool.queue_depth == 3
+        release.set()
+        await asyncio.gather(*tasks)
+        return order, pool
+    
+    order, pool = asyncio.run(run())
+    
+    assert order == ["first", "second", "third", "fourth"]
+    assert pool.in_flight == 0
+    assert pool.admitted == 4
+
+def test_ingestion_yields_to_queued_chat():
+    async def run():
+        chat = AdmissionPool("chat", concurrency=1, slo_seconds=0)
+        ingest = AdmissionPool("ingest", concurrency=4, slo_seconds=0, yield_to=chat)
+        order = []
+        release = asyncio.Event()
+        busy = asyncio.create_task(_hold(chat, "chat-1", order, release))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(_hold(chat, "chat-2", order, release))
+        await asyncio.sleep(0)
+        upload = asyncio.create_task(_hold(ingest, "upload", order, release))
+        await asyncio.sleep(0)
+        
+        # A free ingest slot is not used while chat has a request queued
+        assert order == ["chat-1"]
+        assert ingest.queue_depth == 1
+        release.set()
+        await asyncio.gather(busy, waiting, upload)
+        return order
+    
+    assert asyncio.run(run()) == ["chat-1", "chat-2", "upload"]
+
+def test_requests_over_the_slo_are_shed():
+    async def run():
+        pool = AdmissionPool("chat", concurrency=1, slo_seconds=1.0)
+        pool._service_seconds = 2.0
+        release = asyncio.Event()
+        busy = asyncio.create_task(_hold(pool, "busy", [], release))
+        await asyncio.sleep(0)
+        
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with pool.slot():
+                pass
+        release.set()
+        await busy
+        return pool, rejected.value
+    
+    pool, rejected = asyncio.run(run())
+    
+    assert rejected.retry_after == pytest.approx(2.0)
+    assert rejected.retry_after_header == "2"
+    assert pool.rejected == 1
+
+def test_cancelled_waiter_gives_its_place_to_the_next():
+    async def run():
+        pool = AdmissionPool("chat", concurrency=1, slo_seconds=0)
+        order = []
+        release = asyncio.Event()
+        busy = asyncio.create_task(_hold(pool, "busy", order, release))
+        await asyncio.sleep(0)
+        gave_up = asyncio.create_task(_hold(pool, "gave-up", order, release))
+        patient = asyncio.create_task(_hold(pool, "patient", order, release))
+        await asyncio.sleep(0)
+        
+        gave_up.cancel()
+        await asyncio.gather(gave_up, return_exceptions=True)
+        release.set()
+        await asyncio.gather(busy, patient)
+        return order, pool
+    
+    order, pool = asyncio.run(run())
+    
+    assert order == ["busy", "patient"]
+    assert pool.in_flight == 0
+    assert pool.queue_depth == 0
+
+def test_rate_limiter_allows_a_burst_then_refills(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    limiter = RateLimiter(rate_per_minute=60, burst=2)
+    
+    assert limiter.check("acme:1.2.3.4") is None
+    assert limiter.check("acme:1.2.3.4") is None
+    assert limiter.check("acme:1.2.3.4") == pytest.approx(1.0)
+    assert limiter.check("globex:1.2.3.4") is None
+    
+    now[0] += 1.0
+    assert limiter.check("acme:1.2.3.4") is None
+    assert limiter.limited == 1
+
+def test_rate_limiter_is_disabled_at_zero():
+    limiter = RateLimiter(rate_per_minute=0, burst=1)
+    
+    assert all(limiter.check("acme:1.2.3.4") is None for _ in range(100))
+
+def _request(peer, forwarded_for=None):
+    headers = [(b"x-forwarded-for", value.encode()) for value in forwarded_for or []]
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+def test_client_address_ignores_forwarded_for_from_untrusted_peers(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_trusted_proxies", [])
+    
+    assert client_address(_request("203.0.113.7", ["198.51.100.1"])) == "203.0.113.7"
+
+def test_client_address_behind_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_trusted_proxies", ["10.0.0.0/8", "127.0.0.1"])
+    
+    assert client_address(_request("10.0.0.5", ["198.51.100.1"])) == "198.51.100.1"
+    # The leftmost hop is whatever the client sent; only trusted hops are skipped
+    assert client_address(_request("10.0.0.5", ["1.1.1.1, 198.51.100.1, 10.0.0.9"])) == "198.51.100.1"
+    assert client_address(_request("127.0.0.1", ["1.1.1.1", "198.51.100.1"])) == "198.51.100.1"
+    assert client_address(_request("10.0.0.5")) == "10.0.0.5"
+    assert client_address(_request("203.0.113.7", ["198.51.100.1"])) == "203.0.113.7"
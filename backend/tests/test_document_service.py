@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+from app.config import settings
+from app.services import document_service as document_service_module
+from app.services.document_service import INGEST_MARKER_SUFFIX, DocumentService
+from app.services.vector_store import VectorStoreService
+
+@pytest.fixture(params=["numpy"])
+def service(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "vector_backend", request.param)
+    monkeypatch.setattr(settings, "vector_db_path", str(tmp_path / "chroma"))
+    monkeypatch.setattr(settings, "vector_store_mode", "local")
+    monkeypatch.setattr(settings, "numpy_index_path", str(tmp_path / "numpy"))
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path / "uploads"))
+    monkeypatch.setattr(document_service_module, "vector_store_service", VectorStoreService())
+    return DocumentService()
+
+def _backdate(path, seconds=3600):
+    old = path.stat().st_mtime - seconds
+    os.utime(path, (old, old))
+
+def test_gc_keeps_the_file_of_a_slow_ingestion(service, monkeypatch):
+    reports = []
+    
+    def slow_embedding(chunks, metadata_list, tenant_id=None):
+        # The file is long past the grace period while embedding is still running
+        for file in service.get_upload_dir("acme").glob("*_notes.txt"):
+            _backdate(file)
+        reports.append(service.collect_garbage("acme", grace_seconds=0))
+        return [f"chunk-{i}" for i in range(len(chunks))]
+    
+    monkeypatch.setattr(document_service_module.vector_store_service, "add_documents", slow_embedding)
+    
+    result = service._ingest(b"some text worth keeping", "notes.txt", tenant_id="acme")
+    
+    upload_dir = service.get_upload_dir("acme")
+    assert reports[0]["documents_ingesting"] == 1
+    assert reports[0]["orphan_files_deleted"] == 0
+    assert (upload_dir / f"{result['document_id']}_notes.txt").exists()
+    assert not list(upload_dir.glob(f"*{INGEST_MARKER_SUFFIX}"))
+
+def test_gc_removes_files_of_a_dead_ingestion(service):
+    upload_dir = service.get_upload_dir("acme")
+    upload = upload_dir / "dead_notes.txt"
+    upload.write_bytes(b"left behind")
+    marker = upload_dir / f"dead{INGEST_MARKER_SUFFIX}"
+    marker.write_text("999999999")
+    _backdate(upload)
+    
+    report = service.collect_garbage("acme", grace_seconds=0)
+    
+    assert report["documents_ingesting"] == 0
+    assert report["orphan_files_deleted"] == 1
+    assert not upload.exists()
+    assert not marker.exists()
+
+def test_gc_grace_period_still_covers_unmarked_new_files(service):
+    upload = service.get_upload_dir("acme") / "fresh_notes.txt"
+    upload.write_bytes(b"just written")
+    
+    report = service.collect_garbage("acme", grace_seconds=60)
+    
+    assert report["orphan_files_deleted"] == 0
+    assert upload.exists()
+
+def _add_document(service, document_id, total_chunks=10):
+    store = document_service_module.vector_store_service
+    metadatas = [
+        {"document_id": document_id, "chunk_index": i, "total_chunks": total_chunks,
+         "upload_date": "2020-01-01T00:00:00", "filename": "notes.txt"}
+        for i in range(total_chunks)
+    ]
+    embeddings = [[1.0, float(i), float(len(document_id))] for i in range(total_chunks)]
+    store.get_collection("acme").add(
+        ids=[f"{document_id}-{i}" for i in range(total_chunks)],
+        embeddings=embeddings,
+        documents=[f"chunk {i}" for i in range(total_chunks)],
+        metadatas=metadatas
+    )
+    store.get_document_index("acme").add(
+        ids=[document_id], embeddings=[[1.0, 0.0, 0.0]], metadatas=[{"filename": "notes.txt"}]
+    )
+    upload = service.get_upload_dir("acme") / f"{document_id}_notes.txt"
+    upload.write_bytes(b"content")
+    _backdate(upload)
+    return upload
+
+@pytest.mark.parametrize("service", ["numpy", "chroma"], indirect=True)
+def test_gc_survives_a_delete_between_pages(service, monkeypatch):
+    monkeypatch.setattr(settings, "delete_batch_size", 10)
+    store = document_service_module.vector_store_service
+    uploads = {d: _add_document(service, d) for d in ("doc-a", "doc-b", "doc-c")}
+    scan = store.iter_chunk_metadata
+    
+    def scan_with_concurrent_delete(tenant_id=None, batch_size=None):
+        for number, page in enumerate(scan(tenant_id=tenant_id, batch_size=batch_size)):
+            yield page
+            if number == 0:
+                # Shifts the offsets of the remaining pages
+                store.delete_by_document_id("doc-a", tenant_id=tenant_id)
+                uploads.pop("doc-a").unlink()
+    
+    monkeypatch.setattr(store, "iter_chunk_metadata", scan_with_concurrent_delete)
+    
+    report = service.collect_garbage("acme", grace_seconds=0)
+    
+    assert report["incomplete_documents_deleted"] == 0
+    assert report["orphan_files_deleted"] == 0
+    assert report["stale_document_vectors_deleted"] == 0
+    assert store.count_document_chunks(["doc-b", "doc-c"], tenant_id="acme") == {"doc-b": 10, "doc-c": 10}
+    assert all(upload.exists() for upload in uploads.values())
+    assert sorted(store.get_indexed_document_ids(tenant_id="acme")) == ["doc-b", "doc-c"]
@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+
+from app.config import settings
+from app.services.llm_router import CircuitBreaker, LLMEndpoint, LLMRouter
+
+class Chunk:
+    def __init__(self, content: str):
+        self.content = content
+
+class FakeLLM:
+    """Streams a fixed answer, optionally after blocking on an event"""
+    
+    def __init__(self, answer: str = "answer", release: threading.Event = None, fail: bool = False):
+        self.answer = answer
+        self.release = release
+        self.fail = fail
+        self.calls = 0
+    
+    def stream(self, prompt):
+        self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        if self.fail:
+            raise ConnectionError("provider down")
+        yield Chunk(self.answer)
+
+def open_breaker(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.acquire() == 0
+    
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.acquire() is None
+
+def test_half_open_breaker_allows_one_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    open_breaker(breaker)
+    breaker.opened_at -= 61
+    
+    assert breaker.state == "half_open"
+    probe = breaker.acquire()
+    assert probe
+    assert breaker.acquire() is None
+    
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.acquire() == 0
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    open_breaker(breaker)
+    breaker.opened_at -= 61
+    
+    assert breaker.acquire()
+    breaker.record_failure()
+    
+    assert breaker.state == "open"
+    assert breaker.acquire() is None
+
+def test_released_probe_can_be_reissued_but_stale_release_is_ignored():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    open_breaker(breaker)
+    breaker.opened_at -= 61
+    
+    first = breaker.acquire()
+    breaker.release_probe(first)
+    second = breaker.acquire()
+    assert second and second != first
+    
+    # A late release from the first probe must not free the second one
+    breaker.release_probe(first)
+    assert breaker.acquire() is None
+
+@pytest.fixture
+def fast_hedging(monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_enabled", True)
+    monkeypatch.setattr(settings, "llm_hedge_default_delay_seconds", 0.02)
+    monkeypatch.setattr(settings, "llm_request_timeout_seconds", 5.0)
+
+def test_cancelled_half_open_probe_releases_the_breaker(fast_hedging):
+    stall = threading.Event()
+    recovering = LLMEndpoint("recovering", FakeLLM("slow", release=stall), "m")
+    healthy = LLMEndpoint("healthy", FakeLLM("fast"), "m")
+    router = LLMRouter([recovering, healthy])
+    open_breaker(recovering.breaker)
+    recovering.breaker.opened_at -= settings.llm_circuit_reset_seconds + 1
+    
+    # The probe stalls, the hedge to the healthy endpoint wins and the probe is cancelled
+    assert router.invoke("prompt") == "fast"
+    stall.set()
+    router._executor.shutdown(wait=True)
+    
+    assert recovering.breaker.state == "half_open"
+    assert recovering.breaker.acquire()
+    assert router.get_stats()["attempts_running"] == 0
+
+def test_fails_over_and_reports_pool_usage(fast_hedging):
+    down = LLMEndpoint("down", FakeLLM(fail=True), "m")
+    up = LLMEndpoint("up", FakeLLM("ok"), "m")
+    router = LLMRouter([down, up])
+    
+    assert router.invoke("prompt") == "ok"
+    
+    stats = router.get_stats()
+    assert stats["failovers"] == 1
+    assert stats["attempt_threads"] == router.attempt_threads > 0
+    assert stats["endpoints"][0]["failures"] == 1
+
+def test_all_endpoints_failing_raises(fast_hedging):
+    router = LLMRouter([LLMEndpoint("down", FakeLLM(fail=True), "m")])
+    
+    with pytest.raises(RuntimeError):
+        router.invoke("prompt")
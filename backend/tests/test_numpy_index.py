@@ -0,0 +1,146 @@
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.numpy_index import NumpyVectorIndex
+
+DIM = 16
+
+def random_vectors(n: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def fill(index: NumpyVectorIndex, vectors: np.ndarray, start: int = 0):
+    ids = [f"c{i}" for i in range(start, start + len(vectors))]
+    index.add(
+        ids=ids,
+        embeddings=vectors.tolist(),
+        documents=[f"text {i}" for i in range(start, start + len(vectors))],
+        metadatas=[{"document_id": f"d{i // 10}", "chunk_index": i % 10}
+                   for i in range(start, start + len(vectors))],
+    )
+    return ids
+
+@pytest.mark.parametrize("quantization", ["float32", "float16", "int8"])
+def test_add_and_query_finds_nearest(tmp_path, quantization):
+    index = NumpyVectorIndex(str(tmp_path), quantization=quantization)
+    vectors = random_vectors(100)
+    fill(index, vectors)
+    
+    result = index.query(query_embeddings=[vectors[42].tolist()], n_results=3,
+                         include=["distances", "documents", "metadatas", "embeddings"])
+    
+    assert index.count() == 100
+    assert result["ids"][0][0] == "c42"
+    assert result["documents"][0][0] == "text 42"
+    assert result["metadatas"][0][0] == {"document_id": "d4", "chunk_index": 2}
+    assert result["distances"][0][0] == pytest.approx(0.0, abs=0.02)
+    assert result["distances"][0] == sorted(result["distances"][0])
+    np.testing.assert_allclose(result["embeddings"][0][0], vectors[42], atol=0.02)
+
+def test_rejects_duplicate_ids_and_wrong_dimension(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    fill(index, random_vectors(5))
+    
+    with pytest.raises(ValueError):
+        fill(index, random_vectors(1))
+    with pytest.raises(ValueError):
+        index.add(ids=["other"], embeddings=[[1.0, 0.0]])
+
+def test_where_filters_query_get_and_delete(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    vectors = random_vectors(50)
+    fill(index, vectors)
+    
+    result = index.query(query_embeddings=[vectors[0].tolist()], n_results=50,
+                         where={"document_id": {"$in": ["d2", "d3"]}})
+    assert sorted(result["ids"][0]) == sorted(f"c{i}" for i in range(20, 40))
+    
+    got = index.get(where={"$and": [{"document_id": "d1"}, {"chunk_index": {"$gte": 5}}]})
+    assert got["ids"] == [f"c{i}" for i in range(15, 20)]
+    
+    index.delete(where={"document_id": "d1"})
+    assert index.count() == 40
+    assert index.get(where={"document_id": "d1"})["ids"] == []
+    assert index.get(ids=["c10", "c20"])["ids"] == ["c20"]
+
+def test_delete_compact_and_reopen(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path), quantization="int8", compaction_ratio=1.0)
+    vectors = random_vectors(60)
+    fill(index, vectors)
+    index.delete(ids=[f"c{i}" for i in range(0, 60, 2)])
+    
+    index.compact()
+    fill(index, random_vectors(5, seed=1), start=60)
+    
+    reopened = NumpyVectorIndex(str(tmp_path), quantization="int8")
+    for store in (index, reopened):
+        assert store.count() == 35
+        assert store.get(ids=["c0", "c1", "c62"])["ids"] == ["c1", "c62"]
+        result = store.query(query_embeddings=[vectors[7].tolist()], n_results=1)
+        assert result["ids"][0] == ["c7"]
+        assert result["metadatas"][0] == [{"document_id": "d0", "chunk_index": 7}]
+
+def test_reopen_rejects_other_quantization(tmp_path):
+    fill(NumpyVectorIndex(str(tmp_path)), random_vectors(3))
+    
+    with pytest.raises(ValueError):
+        NumpyVectorIndex(str(tmp_path), quantization="float16")
+
+def test_ivf_is_restored_after_reopen(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path), ivf_min_vectors=200, ivf_nprobe=64)
+    vectors = random_vectors(400)
+    fill(index, vectors)
+    index.wait_for_maintenance()
+    assert index._centroids is not None
+    
+    # Rows added after training are assigned on load
+    fill(index, random_vectors(10, seed=1), start=400)
+    reopened = NumpyVectorIndex(str(tmp_path), ivf_min_vectors=200, ivf_nprobe=64)
+    
+    assert reopened._centroids is not None
+    assert (reopened._assignments[:reopened._size] >= 0).all()
+    result = reopened.query(query_embeddings=[vectors[123].tolist()], n_results=1)
+    assert result["ids"][0] == ["c123"]
+
+def test_compaction_keeps_concurrent_writes(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path), compaction_ratio=1.0)
+    fill(index, random_vectors(2000))
+    index.delete(ids=[f"c{i}" for i in range(0, 2000, 2)])
+    
+    errors = []
+    
+    def write():
+        try:
+            for batch in range(20):
+                start = 2000 + batch * 10
+                fill(index, random_vectors(10, seed=batch + 1), start=start)
+                index.delete(ids=[f"c{start}", f"c{1 + 2 * batch}"])
+        except Exception as e:
+            errors.append(e)
+    
+    def read():
+        try:
+            for _ in range(50):
+                index.query(query_embeddings=random_vectors(1, seed=99).tolist(), n_results=5)
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=write), threading.Thread(target=read)]
+    for thread in threads:
+        thread.start()
+    for _ in range(5):
+        index.compact()
+    for thread in threads:
+        thread.join()
+    index.compact()
+    
+    assert not errors
+    expected = 1000 - 20 + 20 * 9
+    reopened = NumpyVectorIndex(str(tmp_path))
+    for store in (index, reopened):
+        assert store.count() == expected
+        ids = set(store.get()["ids"])
+        assert len(ids) == expected
+        assert "c1" not in ids and "c2000" not in ids and "c2001" in ids
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+def test_concurrent_identical_calls_share_one_run():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+        
+        results = await asyncio.gather(*[flight.do("q", work) for _ in range(5)])
+        other = await flight.do("other", work)
+        return flight, calls, results, other
+    
+    flight, calls, results, other = asyncio.run(scenario())
+    
+    assert len(calls) == 2
+    assert [result for result, _ in results] == ["answer"] * 5
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert other == ("answer", False)
+    assert flight.get_stats()["in_flight"] == 0
+
+def test_key_is_released_after_the_run():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            return len(calls)
+        
+        first = await flight.do("q", work)
+        second = await flight.do("q", work)
+        return first, second
+    
+    assert asyncio.run(scenario()) == ((1, False), (2, False))
+
+def test_errors_reach_every_waiter():
+    async def scenario():
+        flight = SingleFlight()
+        
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+        
+        return await asyncio.gather(*[flight.do("q", work) for _ in range(3)],
+                                    return_exceptions=True)
+    
+    results = asyncio.run(scenario())
+    
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+def test_waiter_timeout_leaves_the_run_for_others():
+    async def scenario():
+        flight = SingleFlight()
+        
+        async def work():
+            await asyncio.sleep(0.1)
+            return "answer"
+        
+        impatient = asyncio.ensure_future(flight.do("q", work, timeout=0.01))
+        patient = asyncio.ensure_future(flight.do("q", work, timeout=1.0))
+        with pytest.raises(asyncio.TimeoutError):
+            await impatient
+        return flight, await patient
+    
+    flight, result = asyncio.run(scenario())
+    
+    assert result == ("answer", True)
+    assert flight.get_stats()["timeouts"] == 1
+
+def test_stalled_run_is_evicted_at_its_deadline():
+    async def scenario():
+        flight = SingleFlight()
+        stalled = asyncio.Event()
+        
+        async def stall():
+            await stalled.wait()
+        
+        async def work():
+            return "fresh"
+        
+        leader = asyncio.ensure_future(flight.do("q", stall, timeout=10, run_timeout=0.05))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("q", stall, timeout=10, run_timeout=0.05))
+        outcomes = await asyncio.gather(leader, follower, return_exceptions=True)
+        
+        # The next caller starts a new run instead of joining the stalled one
+        return flight, outcomes, await flight.do("q", work)
+    
+    flight, outcomes, result = asyncio.run(scenario())
+    
+    assert all(isinstance(outcome, asyncio.TimeoutError) for outcome in outcomes)
+    assert result == ("fresh", False)
+    assert flight.get_stats()["run_timeouts"] == 1
+    assert flight.get_stats()["in_flight"] == 0
@@ -0,0 +1,35 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services.vector_store import DOCUMENT_INDEX_SUFFIX, validate_tenant_id
+
+@pytest.mark.parametrize("tenant_id", ["acme", "a", "acme-corp", "acme_corp", "A1-b_2", "x" * 40])
+def test_valid_tenant_ids_are_accepted(tenant_id):
+    assert validate_tenant_id(tenant_id) == tenant_id
+
+def test_missing_tenant_id_is_the_default_tenant():
+    assert validate_tenant_id(None) == settings.default_tenant_id
+    assert validate_tenant_id("") == settings.default_tenant_id
+
+@pytest.mark.parametrize("tenant_id", [
+    "../etc", "acme/docs", "_acme", "acme-", "-acme", "acme corp", "x" * 41
+])
+def test_malformed_tenant_ids_are_rejected(tenant_id):
+    with pytest.raises(ValueError):
+        validate_tenant_id(tenant_id)
+
+@pytest.mark.parametrize("tenant_id", [
+    "acme" + DOCUMENT_INDEX_SUFFIX, "acme__rebuild", "acme__corp"
+])
+def test_reserved_separator_is_rejected(tenant_id):
+    # tenant_acme__docs would be acme's document index
+    with pytest.raises(ValueError):
+        validate_tenant_id(tenant_id)
+
+@pytest.mark.parametrize("tenant_id", ["acme__docs", "acme__rebuild"])
+def test_reserved_tenant_header_is_a_bad_request(tenant_id):
+    response = TestClient(app).get("/api/documents/", headers={"X-Tenant-ID": tenant_id})
+    
+    assert response.status_code == 400
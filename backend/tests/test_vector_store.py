@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+from app.config import settings
+from app.services.vector_store import VectorStoreService
+
+@pytest.fixture
+def numpy_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "vector_backend", "numpy")
+    monkeypatch.setattr(settings, "vector_store_mode", "local")
+    monkeypatch.setattr(settings, "numpy_index_path", str(tmp_path))
+    return VectorStoreService()
+
+def test_cache_of_one_keeps_the_tenant_being_opened(numpy_store, monkeypatch):
+    monkeypatch.setattr(settings, "tenant_collection_cache_size", 1)
+    
+    assert numpy_store.get_collection("acme") is not None
+    assert numpy_store.get_collection("globex") is not None
+    
+    assert numpy_store.get_open_tenants() == [settings.default_tenant_id, "globex"]
+
+def test_cache_evicts_least_recently_used_tenant(numpy_store, monkeypatch):
+    monkeypatch.setattr(settings, "tenant_collection_cache_size", 3)
+    
+    for tenant_id in ("acme", "globex", "initech"):
+        numpy_store.get_collection(tenant_id)
+    numpy_store.get_collection("acme")
+    numpy_store.get_collection("umbrella")
+    
+    assert numpy_store.get_open_tenants() == [settings.default_tenant_id, "acme", "umbrella"]
+
+def test_idle_tenants_are_evicted_but_default_stays(numpy_store, monkeypatch):
+    numpy_store.get_collection("acme")
+    monkeypatch.setattr(settings, "tenant_idle_seconds", -1)
+    
+    numpy_store.get_collection("globex")
+    
+    assert numpy_store.get_open_tenants() == [settings.default_tenant_id, "globex"]
+
+def test_evicted_numpy_index_in_use_is_reused(numpy_store, monkeypatch):
+    monkeypatch.setattr(settings, "tenant_collection_cache_size", 1)
+    
+    # Stands in for an upload still writing to the evicted handle
+    in_use = numpy_store.get_collection("acme")
+    numpy_store.get_collection("globex")
+    assert "acme" not in numpy_store.get_open_tenants()
+    
+    assert numpy_store.get_collection("acme") is in_use
+    assert numpy_store.get_document_index("acme") is numpy_store.get_document_index("acme")
+
+def test_slow_open_blocks_only_its_own_tenant(numpy_store, monkeypatch):
+    opened = []
+    release = threading.Event()
+    open_collection = numpy_store._open_collection
+    
+    def slow_open(tenant_id):
+        opened.append(tenant_id)
+        if tenant_id == "cold":
+            assert release.wait(5)
+        return open_collection(tenant_id)
+    
+    monkeypatch.setattr(numpy_store, "_open_collection", slow_open)
+    results = []
+    openers = [
+        threading.Thread(target=lambda: results.append(numpy_store.get_collection("cold")))
+        for _ in range(3)
+    ]
+    for opener in openers:
+        opener.start()
+    
+    # Served while the cold tenant is still being opened
+    assert numpy_store.get_collection("warm") is not None
+    assert numpy_store.get_collection() is not None
+    
+    release.set()
+    for opener in openers:
+        opener.join(5)
+    
+    assert opened.count("cold") == 1
+    assert len(results) == 3 and all(r is results[0] for r in results)
+    assert numpy_store._open_locks == {}
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        return [1.0, 0.0, 0.0]
+
+def test_mmr_is_off_by_default_and_opt_in_per_request(numpy_store, monkeypatch):
+    monkeypatch.setattr(numpy_store, "embeddings", FakeEmbeddings())
+    vectors = {"dup-1": [1.0, 0.01, 0.0], "dup-2": [1.0, 0.02, 0.0], "dup-3": [1.0, 0.03, 0.0],
+               "other": [1.0, 0.0, 0.6]}
+    numpy_store.get_collection().add(
+        ids=list(vectors), embeddings=list(vectors.values()),
+        documents=list(vectors), metadatas=[{"document_id": d} for d in vectors]
+    )
+    
+    relevant = numpy_store.similarity_search("query", k=2)
+    diverse = numpy_store.similarity_search("query", k=2, mmr_lambda=0.5)
+    
+    assert [r["content"] for r in relevant] == ["dup-1", "dup-2"]
+    assert [r["content"] for r in diverse] == ["dup-1", "other"]